@@ -26,3 +26,6 @@ class CandidateForm(forms.ModelForm):
     class Meta:
         model = Candidate
         fields = ['position', 'name', 'photo', 'manifesto']
+
+class VoterRollForm(forms.Form):
+    roll = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
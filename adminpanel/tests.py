@@ -1,3 +1,120 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from elections.models import Ballot, Candidate, Election, Position
+
+User = get_user_model()
+
+
+class BulkApprovalTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('chief', role='admin', is_approved=True)
+        self.pending = [User.objects.create_user(f'staff{i}', role='admin') for i in range(3)]
+        self.client.force_login(self.admin)
+
+    def test_bulk_approve_is_one_update(self):
+        voter = User.objects.create_user('voter')
+        ids = [user.id for user in self.pending[:2]] + [voter.id]
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('bulk_approve_admins'), {'user_ids': ids})
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "users_customuser"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            set(User.objects.filter(is_approved=True).values_list('username', flat=True)),
+            {'chief', 'staff0', 'staff1'},
+        )
+
+    def test_bulk_deny_removes_only_pending_admins(self):
+        ids = [self.pending[0].id, self.admin.id]
+
+        response = self.client.post(reverse('bulk_deny_admins'), {'user_ids': ids})
+
+        self.assertRedirects(response, reverse('manage_admins'), fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(id=self.pending[0].id).exists())
+        self.assertTrue(User.objects.filter(id=self.admin.id).exists())
+
+    def test_import_voters_returns_set_password_links(self):
+        roll = SimpleUploadedFile('roll.csv', b'username,email\nalice,alice@example.edu\n')
+
+        response = self.client.post(reverse('import_voters'), {'roll': roll})
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], 'username,email,set_password_url')
+        self.assertTrue(lines[1].startswith('alice,alice@example.edu,http://testserver/users/set-password/'))
+        self.assertEqual(User.objects.get(username='alice').role, 'voter')
+
+    def test_pending_admin_cannot_import_voters(self):
+        self.client.force_login(self.pending[0])
+        roll = SimpleUploadedFile('roll.csv', b'username\nmallory\n')
+
+        response = self.client.post(reverse('import_voters'), {'roll': roll})
+
+        self.assertRedirects(response, reverse('election_list'), fetch_redirect_response=False)
+        self.assertFalse(User.objects.filter(username='mallory').exists())
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('chief', role='admin', is_approved=True)
+        for i in range(4):
+            User.objects.create_user(f'voter{i}')
+        self.client.force_login(self.admin)
+
+    def add_election(self, title, positions=2, candidates=3, ballots=2):
+        now = timezone.now()
+        election = Election.objects.create(
+            title=title, description='', start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        for p in range(positions):
+            position = Position.objects.create(title=f'Position {p}', election=election)
+            for c in range(candidates):
+                Candidate.objects.create(position=position, name=f'{title} {p}.{c}', photo='candidates/test.png')
+        Ballot.objects.bulk_create(Ballot(election=election, voter_hash=f'{title}-{i}') for i in range(ballots))
+        return election
+
+    def count_dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cards_show_annotated_figures(self):
+        election = self.add_election('Council', positions=2, candidates=3, ballots=2)
+
+        card = self.client.get(reverse('admin_dashboard')).context['elections'][0]
+
+        self.assertEqual(card.id, election.id)
+        self.assertEqual((card.positions_count, card.candidates_count, card.ballots_cast), (2, 6, 2))
+        self.assertEqual(card.turnout, 50.0)
+
+    def test_query_count_does_not_grow_with_elections(self):
+        self.add_election('First')
+        self.client.get(reverse('admin_dashboard'))  # fills the counters cache
+        baseline = self.count_dashboard_queries()
+
+        for i in range(4):
+            self.add_election(f'Extra {i}', positions=3, candidates=4, ballots=3)
+
+        self.assertEqual(self.count_dashboard_queries(), baseline)
+
+    def test_elections_are_paginated(self):
+        for i in range(12):
+            self.add_election(f'Election {i}', positions=1, candidates=1, ballots=0)
+
+        first = self.client.get(reverse('admin_dashboard')).context['page_obj']
+        second = self.client.get(reverse('admin_dashboard'), {'page': 2}).context['page_obj']
 
-# Create your tests here.
+        self.assertEqual((len(first), len(second)), (10, 2))
+        self.assertEqual(first.paginator.count, 12)
@@ -9,4 +9,7 @@ urlpatterns = [
     path('manage-admins/',manage_admins, name='manage_admins'),
     path('approve-admin/<int:user_id>/', approve_admin, name='approve_admin'),
     path('deny-admin/<int:user_id>/', deny_admin, name='deny_admin'),
+    path('approve-admins/', bulk_approve_admins, name='bulk_approve_admins'),
+    path('deny-admins/', bulk_deny_admins, name='bulk_deny_admins'),
+    path('import-voters/', import_voters, name='import_voters'),
 ]
@@ -1,3 +1,6 @@
+import csv
+import io
+
 from django.shortcuts import render, redirect
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
@@ -6,25 +9,71 @@ from .decorators import admin_required
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Count, ExpressionWrapper, F, FloatField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.decorators import login_required
-from .forms import ElectionForm, PositionForm, CandidateForm
-from elections.models import Election, Position, Candidate
+from django.http import HttpResponse
+from django.views.decorators.http import require_POST
+from .forms import ElectionForm, PositionForm, CandidateForm, VoterRollForm
+from elections.models import Election, Position, Candidate, Ballot
 from users.models import CustomUser
+from users.roll import LINKS_HEADER, ROLL_HEADER, import_roll, set_password_links
 
 User = get_user_model()
 
+# Seconds the headline counters on the dashboard may be out of date
+DASHBOARD_COUNTERS_TTL = 30
+ELECTIONS_PER_PAGE = 10
+
+
+def _count_subquery(queryset, group_by):
+    """
+    Correlated COUNT(*) of a queryset already filtered on OuterRef('pk').
+    """
+    return Coalesce(Subquery(
+        queryset.order_by().values(group_by).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def _dashboard_counters():
+    return {
+        'active_sessions': Session.objects.filter(expire_date__gte=timezone.now()).count(),
+        'total_voters': User.objects.exclude(role='admin').count(),
+    }
+
+
 @login_required
 @admin_required
 def dashboard(request):
-    # Get all elections
-    elections = Election.objects.all().order_by('-start_time')  # latest first
+    counters = cache.get_or_set('adminpanel:dashboard:counters', _dashboard_counters, DASHBOARD_COUNTERS_TTL)
+    total_voters = counters['total_voters']
+
+    # One query for the page of elections with every figure the cards show;
+    # subqueries keep the counts from multiplying each other like joins would
+    elections = Election.objects.annotate(
+        positions_count=_count_subquery(Position.objects.filter(election=OuterRef('pk')), 'election'),
+        candidates_count=_count_subquery(
+            Candidate.objects.filter(position__election=OuterRef('pk')), 'position__election'
+        ),
+        ballots_cast=_count_subquery(Ballot.objects.filter(election=OuterRef('pk')), 'election'),
+        turnout=ExpressionWrapper(
+            F('ballots_cast') * 100.0 / total_voters if total_voters else Value(0.0),
+            output_field=FloatField(),
+        ),
+    ).prefetch_related(
+        Prefetch('positions', queryset=Position.objects.only('id', 'title', 'election_id').order_by('id'))
+    ).order_by('-start_time')  # latest first
+    page_obj = Paginator(elections, ELECTIONS_PER_PAGE).get_page(request.GET.get('page'))
+
     form = ElectionForm() # Make sure this instance is created
-    active_sessions_count = Session.objects.filter(expire_date__gte=timezone.now()).count()
-    total_voters_count = User.objects.exclude(role='admin').count()
     return render(request, 'adminpanel/dashboard.html', 
-                  {'elections': elections,'form': form, 
-                   'active_sessions': active_sessions_count,
-                   'total_votes': total_voters_count,})
+                  {'elections': page_obj,'form': form, 
+                   'page_obj': page_obj,
+                   'active_sessions': counters['active_sessions'],
+                   'total_votes': total_voters,})
 @admin_required
 @login_required
 def manage_admins(request):
@@ -77,6 +126,70 @@ def deny_admin(request, user_id):
     return redirect('manage_admins')
 
 
+def _selected_pending_admins(request):
+    """
+    The pending admin requests ticked on the manage_admins page.
+    """
+    ids = [int(user_id) for user_id in request.POST.getlist('user_ids') if user_id.isdigit()]
+    return User.objects.filter(id__in=ids, role='admin', is_approved=False)
+
+@login_required
+@require_POST
+def bulk_approve_admins(request):
+    if request.user.role != 'admin' or not request.user.is_approved:
+        messages.error(request, "Unauthorized access.")
+        return redirect('election_list')
+
+    # One UPDATE ... WHERE id IN (...) however many requests are ticked
+    approved = _selected_pending_admins(request).update(is_approved=True)
+    messages.success(request, f"Access granted to {approved} administrator(s).")
+    return redirect('manage_admins')
+
+@login_required
+@require_POST
+def bulk_deny_admins(request):
+    if request.user.role != 'admin' or not request.user.is_approved:
+        messages.error(request, "Unauthorized access.")
+        return redirect('election_list')
+
+    # Removed as in deny_admin, but with set-based DELETEs (related rows
+    # first) rather than one delete() per account
+    denied = _selected_pending_admins(request).delete()[1].get(User._meta.label, 0)
+    messages.info(request, f"{denied} administrator request(s) denied and removed.")
+    return redirect('manage_admins')
+
+@login_required
+@admin_required
+def import_voters(request):
+    """
+    Load a voter roll from CSV (see users.roll). The response is a CSV of
+    one-time links with which the new voters choose their passwords.
+    """
+    # Creates approved accounts, so a pending admin must not reach it
+    if not request.user.is_approved:
+        messages.error(request, "Unauthorized access.")
+        return redirect('election_list')
+
+    form = VoterRollForm(request.POST or None, request.FILES or None)
+    if form.is_valid():
+        lines = io.TextIOWrapper(form.cleaned_data['roll'], encoding='utf-8-sig', newline='')
+        try:
+            voters = import_roll(lines)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+        except UnicodeDecodeError:
+            messages.error(request, "The voter roll is not UTF-8 text.")
+        else:
+            response = HttpResponse(content_type='text/csv', headers={
+                'Content-Disposition': 'attachment; filename="voter-links.csv"',
+            })
+            writer = csv.writer(response)
+            writer.writerow(LINKS_HEADER)
+            writer.writerows(set_password_links(voters, request.build_absolute_uri('/')))
+            return response
+    return render(request, 'adminpanel/import_voters.html', {'form': form, 'columns': ROLL_HEADER})
+
 def manage_elections(request):
     elections = Election.objects.all()
     form = ElectionForm(request.POST or None)
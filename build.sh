@@ -1,4 +1,8 @@
 #!/usr/bin/env bash
 pip install -r requirements.txt
+# In production collectstatic writes content-hashed copies of each asset plus
+# .gz and .br versions for WhiteNoise (VOTE_TOKEN_KEY must be set, as for the
+# web process)
+export DJANGO_ENV=${DJANGO_ENV:-production}
 python manage.py collectstatic --noinput
 python manage.py migrate
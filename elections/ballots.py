@@ -0,0 +1,16 @@
+from django.db.models import Prefetch
+from .models import Candidate, Position
+
+
+def load_ballot(election):
+    """
+    Positions of an election with their candidates prefetched, limited to
+    the fields the ballot page uses. Always two queries.
+    """
+    candidates = Candidate.objects.only('id', 'position_id', 'name', 'photo', 'photo_hash', 'manifesto').order_by('id')
+    return list(
+        Position.objects.filter(election=election)
+        .only('id', 'title', 'election_id')
+        .order_by('id')
+        .prefetch_related(Prefetch('candidates', queryset=candidates))
+    )
@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .tally import tally_election
+from .ballots import load_ballot
+from .models import CandidateTally, Election
+
+# How long a request waits for another request that is already recomputing
+# the same results before giving up and computing them itself
+RECOMPUTE_WAIT = 5.0
+RECOMPUTE_POLL = 0.05
+# Upper bound on the life of a snapshot while voting is open, even if the
+# tally version has not moved (turnout also depends on newly registered voters)
+LIVE_SNAPSHOT_TIMEOUT = 60
+# Cached ballots are keyed by Election.cache_version, so an entry is never
+# stale; the timeout only lets superseded versions drop out of the cache
+BALLOT_CACHE_TIMEOUT = 3600
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESULTS_CACHE_ALIAS', 'default')]
+
+
+def _results_key(election_id):
+    return f'elections:results:{election_id}'
+
+
+def tally_version(election):
+    """
+    Identifies the state of an election's results: its cache_version plus
+    the number of votes counted so far. Read from the database (one small
+    aggregate over the election's CandidateTally rows), so a vote committed
+    by any process or a tally correction is seen by every process without
+    a shared cache or any extra write per vote.
+    """
+    counted = CandidateTally.objects.filter(election=election).aggregate(total=Sum('count'))['total'] or 0
+    return f'{election.cache_version}:{counted}'
+
+
+def _is_usable(snapshot, version, closed):
+    if snapshot['version'] == version:
+        return True
+    if closed:
+        # After the polls close nothing should change, so a different
+        # version means a late commit or a correction: always recompute
+        return False
+    max_staleness = getattr(settings, 'RESULTS_CACHE_MAX_STALENESS', 5)
+    return time.time() - snapshot['computed_at'] < max_staleness
+
+
+def get_results(election):
+    """
+    Return tally_election(election), served from the cache when possible.
+
+    Snapshots are stored per election together with the tally version they
+    were computed at. A snapshot whose version is current is always reused;
+    while voting is open an outdated one is still served until it is older
+    than RESULTS_CACHE_MAX_STALENESS seconds. Once election.end_time has
+    passed only a current snapshot is served, and it is then kept
+    indefinitely.
+    Concurrent misses are coalesced: one request recomputes while the others
+    serve the previous snapshot or wait for the new one.
+    """
+    cache = get_cache()
+    key = _results_key(election.id)
+    lock_key = f'{key}:lock'
+    closed = timezone.now() > election.end_time
+    version = tally_version(election)
+
+    snapshot = cache.get(key)
+    if snapshot is not None and _is_usable(snapshot, version, closed):
+        return snapshot['results']
+
+    locked = cache.add(lock_key, 1, timeout=int(RECOMPUTE_WAIT) + 1)
+    if not locked:
+        if snapshot is not None:
+            return snapshot['results']
+        deadline = time.monotonic() + RECOMPUTE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(RECOMPUTE_POLL)
+            snapshot = cache.get(key)
+            if snapshot is not None:
+                return snapshot['results']
+
+    try:
+        results = tally_election(election)
+        cache.set(key, {
+            'results': results,
+            'version': version,
+            'computed_at': time.time(),
+            'closed': closed,
+        }, timeout=None if closed else LIVE_SNAPSHOT_TIMEOUT)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return results
+
+
+def invalidate_results(election_id):
+    get_cache().delete(_results_key(election_id))
+
+
+def bump_cache_version(election_id):
+    """
+    Mark everything cached about an election as outdated, in every process:
+    the version lives in the Election row, which each request loads anyway.
+    Call inside the transaction that changes the election, its positions,
+    candidates or tallies, so the bump commits with the change.
+    """
+    Election.objects.filter(id=election_id).update(cache_version=F('cache_version') + 1)
+
+
+def _ballot_key(election):
+    return f'elections:ballot:{election.id}:{election.cache_version}'
+
+
+def get_ballot(election):
+    """
+    Return load_ballot(election) from the cache. The definition only
+    changes when an admin edits the election, its positions or candidates,
+    which bumps election.cache_version and so moves on to a fresh key.
+    """
+    cache = get_cache()
+    key = _ballot_key(election)
+    positions = cache.get(key)
+    if positions is None:
+        positions = load_ballot(election)
+        cache.set(key, positions, timeout=BALLOT_CACHE_TIMEOUT)
+    return positions
@@ -0,0 +1,38 @@
+import csv
+
+from django.core.exceptions import ValidationError
+
+# Errors reported for one import before giving up on listing the rest
+MAX_ERRORS = 50
+
+
+def read_csv(lines, required, check_row, name, empty):
+    """
+    Validate every row of an uploaded CSV file (header row first) for the
+    bulk imports. check_row(row) returns what to keep for a row or raises
+    ValidationError; each problem is reported with its line number, up to
+    MAX_ERRORS. Returns the kept values or raises ValidationError listing
+    everything found. name is how messages refer to the file, empty the
+    message for a file without rows.
+    """
+    reader = csv.DictReader(lines)
+    missing = [column for column in required if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValidationError(f"The {name} has no {', '.join(missing)} column(s).")
+
+    rows = []
+    errors = []
+    for line, row in enumerate(reader, start=2):
+        try:
+            rows.append(check_row(row))
+        except ValidationError as e:
+            errors.append(f"Line {line}: {' '.join(e.messages)}")
+            if len(errors) >= MAX_ERRORS:
+                errors.append("Too many errors, stopped checking.")
+                break
+
+    if not rows and not errors:
+        errors.append(empty)
+    if errors:
+        raise ValidationError(errors)
+    return rows
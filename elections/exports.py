@@ -0,0 +1,94 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from .models import Vote
+from .tally import tally_election
+
+# Rows fetched per database round trip; the export never holds more than
+# one chunk in memory
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+RESULTS_HEADER = ('position_id', 'position', 'candidate_id', 'candidate', 'votes', 'percentage')
+LEDGER_HEADER = ('ballot_id', 'position_id', 'candidate_token', 'audit_payload', 'timestamp')
+
+
+def result_rows(election, results=None):
+    """
+    One row per candidate, in ballot order.
+    """
+    if results is None:
+        results = tally_election(election)
+    for group in results['results_by_position']:
+        position = group['position']
+        for r in group['candidates']:
+            yield (position.id, position.title, r['candidate'].id, r['candidate'].name,
+                   r['count'], round(r['percentage'], 2))
+
+
+def ledger_rows(election, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    The anonymised vote ledger, streamed from the database in chunks of
+    chunk_size rows (a server-side cursor on PostgreSQL). Votes are grouped
+    by ballot id; the voter hash is left out, since an unkeyed hash of a
+    user id would tie every ballot back to its voter.
+    """
+    rows = (
+        Vote.objects.filter(election=election)
+        .order_by('id')
+        .values_list('ballot_id', 'position_id', 'candidate_encrypted', 'audit_payload', 'timestamp')
+        .iterator(chunk_size=chunk_size)
+    )
+    for ballot_id, position_id, token, audit_payload, timestamp in rows:
+        yield ballot_id, position_id, token, audit_payload, timestamp.isoformat()
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line straight back, so
+    csv.writer can be used to produce one string per row.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), separators=(',', ':')) + '\n'
+
+
+def export_lines(header, rows, export_format):
+    """
+    Serialise rows as CSV (with a header line) or JSON Lines.
+    """
+    if export_format == 'csv':
+        return csv_lines(header, rows)
+    return jsonl_lines(header, rows)
+
+
+async def aiter_lines(lines, batch_size=EXPORT_CHUNK_SIZE):
+    """
+    Async wrapper for a line generator. Under ASGI Django would otherwise
+    read a sync iterator to the end before sending anything; this pulls
+    batch_size lines per hop to the (single, thread-sensitive) sync thread,
+    so the cursor behind ledger_rows() stays on one connection.
+    """
+    lines = iter(lines)
+    take = sync_to_async(lambda: list(islice(lines, batch_size)))
+    while True:
+        batch = await take()
+        if not batch:
+            break
+        yield ''.join(batch)
@@ -4,27 +4,42 @@ from .models import Election, Position, Candidate
 # forms.py
 from django import forms
 from .models import Vote, Candidate
+from .ballots import load_ballot
 import hashlib
 
 class VoteForm(forms.Form):
-    candidate = forms.ModelChoiceField(
-        queryset=Candidate.objects.none(),  # will be set dynamically
-        widget=forms.RadioSelect,
-        empty_label=None,
-        label="Select a Candidate"
-    )
+    """
+    A full ballot: one radio group per position, named position_<id> to
+    match vote.html. Choices come from the preloaded ballot (see
+    elections.ballots.load_ballot), so validating a submission needs no
+    further lookups.
+    """
 
-    def __init__(self, election=None, *args, **kwargs):
-        """
-        Dynamically set candidates based on the election.
-        """
+    def __init__(self, election=None, *args, positions=None, **kwargs):
         super().__init__(*args, **kwargs)
-        if election:
-            # Only include candidates belonging to positions in this election
-            self.fields['candidate'].queryset = Candidate.objects.filter(
-                position__election=election
+        self.candidates = {}
+        if positions is None and election:
+            positions = load_ballot(election)
+
+        for position in positions or []:
+            candidates = list(position.candidates.all())
+            if not candidates:
+                continue
+            for candidate in candidates:
+                self.candidates[candidate.id] = candidate
+            self.fields[f'position_{position.id}'] = forms.TypedChoiceField(
+                choices=[(candidate.id, candidate.name) for candidate in candidates],
+                coerce=int,
+                widget=forms.RadioSelect,
+                label=position.title,
             )
 
+    def selected_candidates(self):
+        """
+        The chosen Candidate for each position, once the form is valid.
+        """
+        return [self.candidates[candidate_id] for candidate_id in self.cleaned_data.values()]
+
 
 from django import forms
 from .models import Election
@@ -78,3 +93,10 @@ class CandidateForm(forms.ModelForm):
             }),
         }
 
+
+class BallotImportForm(forms.Form):
+    """
+    Manifest and photo archive for elections.imports.import_ballot.
+    """
+    manifest = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
+    photos = forms.FileField(widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.zip'}))
@@ -0,0 +1,151 @@
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .caching import bump_cache_version, invalidate_results
+from .csvimport import read_csv
+from .models import Candidate, Position
+from .photos import prepare_photo, save_thumbnails
+from .storage import photo_storage
+
+BALLOT_HEADER = ('position', 'name', 'photo', 'manifesto')
+REQUIRED_COLUMNS = ('position', 'name', 'photo')
+
+# Largest photo accepted from an archive, uncompressed
+MAX_PHOTO_BYTES = 10 * 1024 * 1024
+
+TITLE_LENGTH = Position._meta.get_field('title').max_length
+NAME_LENGTH = Candidate._meta.get_field('name').max_length
+
+
+def _photo_members(archive):
+    """
+    Archive members by full path and, where unambiguous, by file name, so
+    the manifest may say either 'photos/alice.jpg' or 'alice.jpg'.
+    """
+    members = {}
+    by_name = {}
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        members[info.filename] = info
+        by_name.setdefault(os.path.basename(info.filename), []).append(info)
+    for name, infos in by_name.items():
+        if len(infos) == 1:
+            members.setdefault(name, infos[0])
+    return members
+
+
+def read_manifest(election, lines, archive=None):
+    """
+    Validate a ballot manifest (CSV with a BALLOT_HEADER header row, one
+    candidate per row) against the election and the photo archive. Returns
+    [(position title, name, archive member, manifesto)] or raises
+    ValidationError listing every problem found.
+    """
+    members = _photo_members(archive) if archive else {}
+    taken = set(
+        Candidate.objects.filter(position__election=election).values_list('position__title', 'name')
+    )
+
+    def check_row(row):
+        title = (row['position'] or '').strip()
+        name = (row['name'] or '').strip()
+        photo = (row['photo'] or '').strip()
+        if not title or not name or not photo:
+            raise ValidationError("position, name and photo are required.")
+        if len(title) > TITLE_LENGTH or len(name) > NAME_LENGTH:
+            raise ValidationError(f"position titles are limited to {TITLE_LENGTH} "
+                                  f"and names to {NAME_LENGTH} characters.")
+        if (title, name) in taken:
+            raise ValidationError(f"{name} is already standing for {title}.")
+        if photo not in members:
+            raise ValidationError(f"{photo} is not in the photo archive.")
+        if members[photo].file_size > MAX_PHOTO_BYTES:
+            raise ValidationError(f"{photo} is larger than {MAX_PHOTO_BYTES // (1024 * 1024)} MB.")
+        taken.add((title, name))
+        return title, name, members[photo].filename, (row.get('manifesto') or '').strip()
+
+    return read_csv(lines, REQUIRED_COLUMNS, check_row, 'manifest', "The manifest lists no candidates.")
+
+
+def prepare_photos(archive, filenames, workers=None, executor=ProcessPoolExecutor):
+    """
+    {archive member: prepare_photo() result} for each distinct photo,
+    decoded and resized across a pool of workers: processes by default,
+    or whatever executor class is given. Web requests pass
+    ThreadPoolExecutor (Pillow releases the GIL while decoding and
+    resizing) rather than forking from a server worker.
+    """
+    if workers is None:
+        workers = settings.IMPORT_WORKERS
+    filenames = sorted(set(filenames))
+    workers = min(workers, len(filenames))
+    if workers <= 1:
+        return {filename: prepare_photo(archive.read(filename)) for filename in filenames}
+
+    # The archive is read here; workers only receive and return bytes
+    with executor(workers) as pool:
+        photos = pool.map(prepare_photo, (archive.read(filename) for filename in filenames))
+        return dict(zip(filenames, photos))
+
+
+def import_ballot(election, lines, archive, workers=None, executor=ProcessPoolExecutor):
+    """
+    Add the positions and candidates of a manifest to an election in one
+    transaction. Nothing is written unless the whole manifest and every
+    photo are valid. Returns (positions created, candidates created).
+
+    Photos are stored before the rows that refer to them; if the
+    transaction then fails they are left for manage.py gc_media.
+    """
+    rows = read_manifest(election, lines, archive)
+    photos = prepare_photos(archive, [filename for _, _, filename, _ in rows], workers, executor)
+    unreadable = sorted(filename for filename, photo in photos.items() if photo is None)
+    if unreadable:
+        raise ValidationError([f"{filename} is not a readable image." for filename in unreadable])
+
+    storage = photo_storage()
+    stored = {}
+    for filename, (content_hash, data, thumbnails) in photos.items():
+        name = storage.save(f'candidates/{os.path.basename(filename)}', ContentFile(data))
+        save_thumbnails(content_hash, thumbnails=thumbnails)
+        stored[filename] = (name, content_hash)
+
+    with transaction.atomic():
+        positions = dict(Position.objects.filter(election=election).values_list('title', 'id'))
+        new_positions = Position.objects.bulk_create([
+            Position(election=election, title=title)
+            for title in dict.fromkeys(title for title, _, _, _ in rows) if title not in positions
+        ])
+        positions.update((position.title, position.id) for position in new_positions)
+
+        # bulk_create bypasses Candidate.save(), which is why the photos were
+        # prepared above and their stored names and hashes are set directly
+        candidates = Candidate.objects.bulk_create([
+            Candidate(position_id=positions[title], name=name, manifesto=manifesto,
+                      photo=stored[filename][0], photo_hash=stored[filename][1])
+            for title, name, filename, manifesto in rows
+        ], batch_size=500)
+
+        # Signals do not fire for bulk_create either. The version bump
+        # reaches every web process; the local snapshot is dropped directly
+        bump_cache_version(election.id)
+        transaction.on_commit(lambda: invalidate_results(election.id))
+    return len(new_positions), len(candidates)
+
+
+def open_archive(file):
+    """
+    zipfile.ZipFile for an uploaded or local photo archive, raising
+    ValidationError when it is not a ZIP file.
+    """
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ValidationError("The photo archive is not a valid ZIP file.")
@@ -0,0 +1,116 @@
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .voting import cast_ballot, cast_ballots
+
+# How long a request waits for its batch to commit before giving up
+SUBMIT_TIMEOUT = 30
+
+
+class _Submission:
+    def __init__(self, election, voter_hash, candidates):
+        self.args = (election, voter_hash, candidates)
+        self.done = threading.Event()
+        self.ballot = None
+        self.error = None
+
+
+class BallotQueue:
+    """
+    Hands ballots to a single writer thread that commits them in batches
+    with cast_ballots(). A batch is flushed once it holds batch_size ballots
+    or flush_interval seconds after its first ballot arrived, whichever
+    comes first. submit() returns only after the batch holding the ballot
+    has committed, so a successful response still means a stored vote.
+    """
+
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, election, voter_hash, candidates):
+        submission = _Submission(election, voter_hash, candidates)
+        self._start()
+        self._queue.put(submission)
+        if not submission.done.wait(SUBMIT_TIMEOUT):
+            raise TimeoutError("Ballot was not committed in time")
+        if submission.error is not None:
+            raise submission.error
+        return submission.ballot
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='ballot-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        close_old_connections()
+        try:
+            ballots = cast_ballots([submission.args for submission in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0].error = exc
+            else:
+                # One bad ballot (say, for a candidate deleted meanwhile)
+                # rolls back the whole batch: store them one by one so
+                # only that one fails
+                for submission in batch:
+                    try:
+                        submission.ballot = cast_ballot(*submission.args)
+                    except Exception as error:
+                        submission.error = error
+        else:
+            for submission, ballot in zip(batch, ballots):
+                submission.ballot = ballot
+        finally:
+            for submission in batch:
+                submission.done.set()
+
+
+_ballot_queue = None
+_ballot_queue_lock = threading.Lock()
+
+
+def get_ballot_queue():
+    global _ballot_queue
+    with _ballot_queue_lock:
+        if _ballot_queue is None:
+            _ballot_queue = BallotQueue(
+                batch_size=getattr(settings, 'VOTE_INGESTION_BATCH_SIZE', 100),
+                flush_interval=getattr(settings, 'VOTE_INGESTION_FLUSH_INTERVAL', 0.01),
+            )
+        return _ballot_queue
+
+
+def submit_ballot(election, voter_hash, candidates):
+    """
+    Store a ballot using the write path chosen by VOTE_INGESTION_MODE:
+    'direct' commits it in its own transaction, 'queued' through the
+    batching writer thread. Returns the Ballot, or None if the voter had
+    already voted.
+    """
+    if getattr(settings, 'VOTE_INGESTION_MODE', 'direct') == 'queued':
+        return get_ballot_queue().submit(election, voter_hash, candidates)
+    return cast_ballot(election, voter_hash, candidates)
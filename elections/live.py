@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .caching import get_results
+from .models import Election
+
+# Send an SSE comment this often when nothing changed, so proxies keep the
+# connection open
+KEEPALIVE_SECONDS = 15
+
+
+def compact_results(election_id):
+    """
+    {candidate_id: [count, percentage]} plus ballots cast and turnout,
+    taken from the (cached) results used by results_view. get_results
+    checks its snapshot against the vote count in the database, so votes
+    handled by other workers show up within RESULTS_CACHE_MAX_STALENESS
+    seconds whatever cache backend is configured.
+    """
+    election = Election.objects.get(id=election_id)
+    results = get_results(election)
+    candidates = {
+        str(r['candidate'].id): [r['count'], round(r['percentage'], 2)]
+        for group in results['results_by_position']
+        for r in group['candidates']
+    }
+    return {
+        'total': results['ballots_cast'],
+        'turnout': round(results['turnout'], 2),
+        'candidates': candidates,
+    }
+
+
+def _poll_results(election_id):
+    try:
+        return compact_results(election_id)
+    finally:
+        # Runs outside the request cycle, which is what normally closes
+        # the thread's database connection
+        close_old_connections()
+
+
+def format_event(payload, event='tally'):
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+class TallyBroadcaster:
+    """
+    One producer per election and process: it recomputes the compact
+    results once per tick and pushes only what changed to every connected
+    client, so the cost of a tick does not depend on how many are watching.
+    """
+
+    def __init__(self, election_id):
+        self.election_id = election_id
+        self.subscribers = set()
+        self.state = None
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        if self.state is not None:
+            queue.put_nowait(dict(self.state, full=True))
+        self.subscribers.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def run(self):
+        interval = getattr(settings, 'RESULTS_STREAM_INTERVAL', 2)
+        try:
+            while self.subscribers:
+                try:
+                    current = await sync_to_async(_poll_results)(self.election_id)
+                except Election.DoesNotExist:
+                    break
+                self.publish(current)
+                await asyncio.sleep(interval)
+        finally:
+            _broadcasters.pop(self.election_id, None)
+            for queue in self.subscribers:
+                queue.put_nowait(None)
+
+    def publish(self, current):
+        if self.state is None:
+            message = dict(current, full=True)
+        else:
+            changed = {
+                candidate_id: value
+                for candidate_id, value in current['candidates'].items()
+                if self.state['candidates'].get(candidate_id) != value
+            }
+            totals_changed = (current['total'], current['turnout']) != (self.state['total'], self.state['turnout'])
+            if not changed and not totals_changed:
+                return
+            message = {
+                'total': current['total'], 'turnout': current['turnout'],
+                'candidates': changed, 'full': False,
+            }
+        self.state = current
+        for queue in self.subscribers:
+            queue.put_nowait(message)
+
+
+_broadcasters = {}
+
+
+def get_broadcaster(election_id):
+    broadcaster = _broadcasters.get(election_id)
+    if broadcaster is None:
+        broadcaster = _broadcasters[election_id] = TallyBroadcaster(election_id)
+    return broadcaster
+
+
+async def stream_results(election_id):
+    """
+    Async iterator of SSE messages for one client.
+    """
+    broadcaster = get_broadcaster(election_id)
+    queue = broadcaster.subscribe()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if message is None:
+                break
+            yield format_event(message)
+    finally:
+        broadcaster.unsubscribe(queue)
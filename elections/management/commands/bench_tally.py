@@ -0,0 +1,127 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from elections.models import Election, Position, Candidate, Ballot, Vote
+from elections.utils import candidate_token
+
+INDEX_NAME = 'vote_election_candidate_idx'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway election with N votes and time tallying it with and "
+        "without the (election, candidate_encrypted) index. Everything runs in "
+        "one transaction that is rolled back, so the database is left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votes', type=int, default=1_000_000)
+        parser.add_argument('--positions', type=int, default=4)
+        parser.add_argument('--candidates', type=int, default=6, help="Candidates per position")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is reported")
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        self.connection = connections[alias]
+        self.stdout.write(f"Backend: {self.connection.vendor} ({alias})")
+        try:
+            with transaction.atomic(using=alias):
+                election = self.seed(alias, options)
+                self.run(election, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, alias, options):
+        now = timezone.now()
+        election = Election.objects.using(alias).create(
+            title='Tally benchmark', description='',
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        tokens_by_position = []
+        for p in range(options['positions']):
+            position = Position.objects.using(alias).create(title=f'Position {p}', election=election)
+            tokens = []
+            for c in range(options['candidates']):
+                candidate = Candidate.objects.using(alias).create(
+                    position=position, name=f'Candidate {p}.{c}', photo='candidates/benchmark.png'
+                )
+                tokens.append(candidate_token(candidate.id))
+            tokens_by_position.append((position.id, tokens))
+
+        # One ballot per voter with a selection for every position
+        started = time.perf_counter()
+        ballots_needed = -(-options['votes'] // len(tokens_by_position))
+        for offset in range(0, ballots_needed, 10_000):
+            ballots = Ballot.objects.using(alias).bulk_create([
+                Ballot(election=election, voter_hash=f'{i:064x}')
+                for i in range(offset, min(offset + 10_000, ballots_needed))
+            ])
+            votes = []
+            for n, ballot in enumerate(ballots, start=offset):
+                for position_id, tokens in tokens_by_position:
+                    votes.append(Vote(
+                        election=election,
+                        ballot=ballot,
+                        position_id=position_id,
+                        candidate_encrypted=tokens[n % len(tokens)],
+                    ))
+            Vote.objects.using(alias).bulk_create(votes[:options['votes'] - offset * len(tokens_by_position)])
+        tokens = [token for _, position_tokens in tokens_by_position for token in position_tokens]
+        self.stdout.write(f"Seeded {options['votes']:,} votes for {len(tokens)} candidates "
+                          f"in {time.perf_counter() - started:.1f}s")
+        self.execute_sql('ANALYZE')
+        return election
+
+    def run(self, election, repeat):
+        alias = election._state.db
+        candidates = list(Candidate.objects.using(alias)
+                          .filter(position__election=election).values_list('id', flat=True))
+
+        def per_candidate():
+            for candidate_id in candidates:
+                Vote.objects.using(alias).filter(
+                    election=election, candidate_encrypted=candidate_token(candidate_id)
+                ).count()
+
+        def grouped():
+            # Same query as elections.tally.count_votes, routed to the benchmarked alias
+            dict(Vote.objects.using(alias).filter(election=election)
+                 .values_list('candidate_encrypted').annotate(count=Count('id')).order_by())
+
+        quoted = self.connection.ops.quote_name
+        table = quoted(Vote._meta.db_table)
+
+        self.execute_sql(f'DROP INDEX {quoted(INDEX_NAME)}')
+        self.report('per-candidate COUNT, no index', per_candidate, repeat)
+        self.report('grouped COUNT, no index', grouped, repeat)
+
+        self.execute_sql(
+            f'CREATE INDEX {quoted(INDEX_NAME)} ON {table} '
+            f'({quoted("election_id")}, {quoted("candidate_encrypted")})'
+        )
+        self.execute_sql('ANALYZE')
+        self.report('per-candidate COUNT, indexed', per_candidate, repeat)
+        self.report('grouped COUNT, indexed', grouped, repeat)
+
+    def execute_sql(self, sql):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql)
+
+    def report(self, label, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(f"  {label:<32} {min(timings) * 1000:10.1f} ms")
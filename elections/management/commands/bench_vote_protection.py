@@ -0,0 +1,110 @@
+import hashlib
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from elections.models import Election, Position, Candidate, Ballot, Vote
+from elections.tally import count_votes
+from elections.utils import candidate_token, decrypt_vote, encrypt_vote
+
+# How each mode fills (candidate_encrypted, audit_payload)
+MODES = {
+    # What votes stored before keyed tokens: an unkeyed, guessable digest
+    'sha256': lambda candidate_id: (hashlib.sha256(str(candidate_id).encode()).hexdigest(), ''),
+    'hmac': lambda candidate_id: (candidate_token(candidate_id), ''),
+    'hmac+audit': lambda candidate_id: (candidate_token(candidate_id), encrypt_vote(str(candidate_id))),
+    # Randomised encryption only: nothing SQL can group on
+    'fernet': lambda candidate_id: ('', encrypt_vote(str(candidate_id))),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the ways a vote's candidate can be stored: how many values "
+        "per second each mode produces and how long tallying N votes stored "
+        "that way takes. Seeded votes are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=100_000, help="Values generated per mode")
+        parser.add_argument('--votes', type=int, default=100_000, help="Votes seeded per mode for the tally")
+        parser.add_argument('--candidates', type=int, default=6)
+        parser.add_argument('--mode', choices=list(MODES), action='append',
+                            help="Mode to run (repeatable; default: all)")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backend: {connection.vendor}, {options['votes']:,} votes per tally")
+        self.stdout.write(f"  {'mode':<12} {'values/s':>12} {'tally':>12} {'bytes/vote':>12}")
+        for mode in options['mode'] or MODES:
+            try:
+                with transaction.atomic():
+                    self.run(mode, options)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, mode, options):
+        protect = MODES[mode]
+        election, candidate_ids = self.create_election(options['candidates'])
+
+        started = time.perf_counter()
+        for i in range(options['tokens']):
+            protect(candidate_ids[i % len(candidate_ids)])
+        rate = options['tokens'] / (time.perf_counter() - started)
+
+        # Protect each candidate once and reuse the values: seeding speed
+        # is not what is being measured
+        values = [protect(candidate_id) for candidate_id in candidate_ids]
+        size = sum(len(token) + len(payload) for token, payload in values) / len(values)
+        self.seed(election, values, options['votes'])
+
+        started = time.perf_counter()
+        if mode == 'fernet':
+            counts = Counter(
+                int(decrypt_vote(payload)) for payload in
+                Vote.objects.filter(election=election).values_list('audit_payload', flat=True).iterator(chunk_size=2000)
+            )
+        else:
+            by_token = count_votes(election)
+            counts = {candidate_id: by_token.get(token, 0) for candidate_id, (token, _) in zip(candidate_ids, values)}
+        elapsed = time.perf_counter() - started
+        assert sum(counts.values()) == options['votes']
+
+        self.stdout.write(f"  {mode:<12} {rate:12,.0f} {elapsed * 1000:9.1f} ms {size:12.0f}")
+
+    def create_election(self, candidates):
+        now = timezone.now()
+        election = Election.objects.create(
+            title='Vote protection benchmark', description='',
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        position = Position.objects.create(title='Position', election=election)
+        candidate_ids = [
+            Candidate.objects.create(position=position, name=f'Candidate {c}', photo='candidates/benchmark.png').id
+            for c in range(candidates)
+        ]
+        return election, candidate_ids
+
+    def seed(self, election, values, votes):
+        position_id = Position.objects.get(election=election).id
+        for offset in range(0, votes, 10_000):
+            ballots = Ballot.objects.bulk_create([
+                Ballot(election=election, voter_hash=f'{i:064x}')
+                for i in range(offset, min(offset + 10_000, votes))
+            ])
+            Vote.objects.bulk_create([
+                Vote(
+                    election=election, ballot=ballot, position_id=position_id,
+                    candidate_encrypted=values[n % len(values)][0], audit_payload=values[n % len(values)][1],
+                )
+                for n, ballot in enumerate(ballots, start=offset)
+            ])
+        connection.cursor().execute('ANALYZE')
@@ -0,0 +1,99 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.utils import timezone
+
+from elections.ingest import BallotQueue
+from elections.models import Election, Position, Candidate
+from elections.voting import cast_ballot
+
+
+class Command(BaseCommand):
+    help = (
+        "Cast ballots for a throwaway election from concurrent threads and "
+        "report throughput for the direct and queued write paths. The "
+        "election and its ballots are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ballots', type=int, default=5000)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--positions', type=int, default=4)
+        parser.add_argument('--candidates', type=int, default=4, help="Candidates per position")
+        parser.add_argument('--mode', choices=['direct', 'queued', 'both'], default='both')
+        parser.add_argument('--batch-size', type=int, default=settings.VOTE_INGESTION_BATCH_SIZE)
+        parser.add_argument('--flush-interval', type=float, default=settings.VOTE_INGESTION_FLUSH_INTERVAL)
+
+    def handle(self, *args, **options):
+        db = settings.DATABASES['default']
+        self.stdout.write(
+            f"Backend: {connection.vendor}, CONN_MAX_AGE={db.get('CONN_MAX_AGE', 0)}, "
+            f"{options['threads']} threads, {options['ballots']:,} ballots"
+        )
+        modes = ['direct', 'queued'] if options['mode'] == 'both' else [options['mode']]
+        for mode in modes:
+            if mode == 'direct':
+                submit = cast_ballot
+            else:
+                submit = BallotQueue(options['batch_size'], options['flush_interval']).submit
+            election, candidates = self.create_election(options)
+            try:
+                self.run(mode, election, candidates, submit, options)
+            finally:
+                election.delete()
+
+    def create_election(self, options):
+        now = timezone.now()
+        election = Election.objects.create(
+            title='Vote benchmark', description='',
+            start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1),
+        )
+        ballot = []
+        for p in range(options['positions']):
+            position = Position.objects.create(title=f'Position {p}', election=election)
+            ballot.append([
+                Candidate.objects.create(position=position, name=f'Candidate {p}.{c}', photo='candidates/benchmark.png')
+                for c in range(options['candidates'])
+            ])
+        return election, ballot
+
+    def run(self, mode, election, candidates, submit, options):
+        latencies = []
+        failures = []
+        lock = threading.Lock()
+
+        def vote(i):
+            selection = [position[i % len(position)] for position in candidates]
+            started = time.perf_counter()
+            try:
+                submit(election, f'bench-{i}', selection)
+            except Exception as exc:
+                with lock:
+                    failures.append(exc)
+                return
+            finally:
+                # Honour CONN_MAX_AGE the way a request would
+                for conn in connections.all(initialized_only=True):
+                    conn.close_if_unusable_or_obsolete()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(vote, range(options['ballots'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        line = f"  {mode:<7} {len(latencies) / elapsed:9.1f} ballots/s"
+        if latencies:
+            line += (f"   p50 {statistics.median(latencies) * 1000:7.1f} ms"
+                     f"   p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms")
+        if failures:
+            line += f"   {len(failures)} failed ({failures[0]})"
+        self.stdout.write(line)
@@ -0,0 +1,46 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.exports import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, LEDGER_HEADER, RESULTS_HEADER, export_lines, ledger_rows, result_rows,
+)
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Write an election's anonymised vote ledger (or its per-candidate "
+        "results) to a gzip-compressed CSV or JSON Lines file. Rows are "
+        "streamed from the database, so memory use does not grow with the "
+        "number of votes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('--data', choices=['ledger', 'results'], default='ledger')
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', help="Destination file (default: election-<id>-<data>.<format>.gz)")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Unknown election id: {options['election_id']}")
+
+        if options['data'] == 'ledger':
+            header, rows = LEDGER_HEADER, ledger_rows(election, options['chunk_size'])
+        else:
+            header, rows = RESULTS_HEADER, result_rows(election)
+        output = options['output'] or f"election-{election.id}-{options['data']}.{options['format']}.gz"
+
+        written = 0
+        with gzip.open(output, 'wt', encoding='utf-8', newline='') as f:
+            for line in export_lines(header, rows, options['format']):
+                f.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # header line
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written:,} {options['data']} row(s) to {output}."))
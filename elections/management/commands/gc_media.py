@@ -0,0 +1,90 @@
+import os
+import re
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from elections.caching import bump_cache_version
+from elections.models import Candidate
+from elections.photos import photo_hash, save_thumbnails
+from elections.storage import photo_storage
+
+PHOTO_DIR = 'candidates'
+THUMBNAIL_DIR = 'candidates/thumbs'
+CONTENT_ADDRESSED = re.compile(r'^candidates/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete candidate photos and thumbnails that no Candidate refers to. "
+        "With --rehash, photos stored before content addressing are first "
+        "moved to their content-hashed names, so identical copies collapse "
+        "into one file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true', help="Move legacy photos to content-hashed names first")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help="Keep files younger than this many seconds (uploads still being saved)")
+
+    def handle(self, *args, **options):
+        storage = photo_storage()
+        if options['rehash']:
+            self.rehash(storage, options['dry_run'])
+
+        photos = set(Candidate.objects.exclude(photo='').values_list('photo', flat=True))
+        hashes = set(Candidate.objects.exclude(photo_hash='').values_list('photo_hash', flat=True))
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+
+        removed = freed = 0
+        for name in self.walk(storage, PHOTO_DIR):
+            if name.startswith(THUMBNAIL_DIR + '/'):
+                in_use = os.path.basename(name).split('_')[0] in hashes
+            else:
+                in_use = name in photos
+            if in_use or storage.get_modified_time(name) > cutoff:
+                continue
+            removed += 1
+            freed += storage.size(name)
+            self.stdout.write(f"  {'would delete' if options['dry_run'] else 'deleted'} {name}")
+            if not options['dry_run']:
+                storage.delete(name)
+
+        verb = "Would free" if options['dry_run'] else "Freed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {freed / 1024:,.0f} KiB in {removed} orphaned file(s)."))
+
+    def rehash(self, storage, dry_run):
+        moved = 0
+        candidates = (
+            Candidate.objects.exclude(photo='').select_related('position')
+            .only('id', 'photo', 'photo_hash', 'position__election_id').order_by('id')
+        )
+        for candidate in candidates:
+            if CONTENT_ADDRESSED.match(candidate.photo.name) or not storage.exists(candidate.photo.name):
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            with storage.open(candidate.photo.name, 'rb') as f:
+                data = f.read()
+            content_hash = photo_hash(data)
+            name = storage.save(f'{PHOTO_DIR}/{os.path.basename(candidate.photo.name)}', ContentFile(data))
+            save_thumbnails(content_hash, data)
+            Candidate.objects.filter(id=candidate.id).update(photo=name, photo_hash=content_hash)
+            # .update() sends no signals; cached ballots must stop pointing at
+            # the old file before it is deleted below
+            bump_cache_version(candidate.position.election_id)
+        self.stdout.write(f"{'Would move' if dry_run else 'Moved'} {moved} legacy photo(s) to content-hashed names.")
+
+    def walk(self, storage, path):
+        if not storage.exists(path):
+            return
+        directories, files = storage.listdir(path)
+        for name in files:
+            if not name.startswith('.upload-'):
+                yield f'{path}/{name}'
+        for directory in directories:
+            yield from self.walk(storage, f'{path}/{directory}')
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.imports import BALLOT_HEADER, import_ballot, open_archive
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = (
+        "Add positions and candidates to an election from a CSV manifest "
+        f"(columns: {', '.join(BALLOT_HEADER)}) and a ZIP archive of their "
+        "photos. The manifest is checked in full before anything is written "
+        "and all rows are inserted in one transaction; photos are processed "
+        "across a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_id', type=int)
+        parser.add_argument('manifest', help="CSV file, one candidate per row")
+        parser.add_argument('photos', help="ZIP archive with the photos the manifest names")
+        parser.add_argument('--workers', type=int, default=settings.IMPORT_WORKERS,
+                            help="Photo worker processes; 1 processes them in this process")
+
+    def handle(self, *args, **options):
+        try:
+            election = Election.objects.get(id=options['election_id'])
+        except Election.DoesNotExist:
+            raise CommandError(f"Unknown election id: {options['election_id']}")
+
+        started = time.perf_counter()
+        try:
+            with open(options['manifest'], encoding='utf-8-sig', newline='') as lines, \
+                    open(options['photos'], 'rb') as photos:
+                positions, candidates = import_ballot(election, lines, open_archive(photos), options['workers'])
+        except ValidationError as e:
+            raise CommandError("Nothing was imported:\n  " + "\n  ".join(e.messages))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {candidates} candidate(s) and {positions} new position(s) into "
+            f"{election.title} in {time.perf_counter() - started:.1f}s."
+        ))
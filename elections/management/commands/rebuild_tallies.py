@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from elections.models import Election, Candidate, CandidateTally
+from elections.caching import bump_cache_version
+from elections.tally import recount_votes
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute CandidateTally rows from the Vote table and report any "
+        "candidate whose running tally had drifted from the recount."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('election_ids', nargs='*', type=int, help="Elections to rebuild (default: all)")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing corrections")
+
+    def handle(self, *args, **options):
+        elections = Election.objects.order_by('id')
+        if options['election_ids']:
+            elections = elections.filter(id__in=options['election_ids'])
+            missing = set(options['election_ids']) - set(elections.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"Unknown election id(s): {', '.join(map(str, sorted(missing)))}")
+
+        drifted = 0
+        for election in elections:
+            drifted += self.rebuild(election, options['dry_run'])
+
+        if drifted:
+            verb = "found" if options['dry_run'] else "corrected"
+            self.stdout.write(self.style.WARNING(f"Drift {verb} for {drifted} candidate(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS("All tallies match the vote table."))
+
+    def rebuild(self, election, dry_run):
+        with transaction.atomic():
+            # Lock the election's tallies so concurrent votes wait for the rebuild
+            tallies = {
+                tally.candidate_id: tally
+                for tally in CandidateTally.objects.select_for_update().filter(election=election)
+            }
+            recounted = recount_votes(election)
+            positions = dict(
+                Candidate.objects.filter(id__in=recounted).values_list('id', 'position_id')
+            )
+
+            drifted = 0
+            to_create, to_update = [], []
+            for candidate_id, count in recounted.items():
+                tally = tallies.get(candidate_id)
+                current = tally.count if tally else 0
+                if current != count:
+                    drifted += 1
+                    self.stdout.write(
+                        f"Election {election.id} ({election.title}): candidate {candidate_id} "
+                        f"tally {current}, recount {count}"
+                    )
+                if tally is None:
+                    to_create.append(CandidateTally(
+                        election=election, position_id=positions[candidate_id],
+                        candidate_id=candidate_id, count=count,
+                    ))
+                elif tally.count != count:
+                    tally.count = count
+                    to_update.append(tally)
+
+            if not dry_run:
+                CandidateTally.objects.bulk_create(to_create)
+                CandidateTally.objects.bulk_update(to_update, ['count'])
+                if drifted:
+                    bump_cache_version(election.id)
+        return drifted
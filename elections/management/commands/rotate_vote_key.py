@@ -0,0 +1,86 @@
+import os
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from elections.models import Candidate, Vote
+from elections.utils import candidate_token, get_fernet, vote_encryption_keys
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encrypt every vote audit payload with the newest key in "
+        "VOTE_ENCRYPTION_KEYS. Works through the Vote table in id order, one "
+        "transaction per batch, and skips payloads already under the newest "
+        "key, so an interrupted run can simply be started again (or resumed "
+        "with --after-id). Once it finishes, older keys can be dropped. "
+        "With --retoken, instead rewrite every vote's candidate token from "
+        "the previous VOTE_TOKEN_KEY to the current one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--after-id', type=int, default=0, help="Resume after this vote id")
+        parser.add_argument('--retoken', action='store_true',
+                            help="Move candidate tokens to the current VOTE_TOKEN_KEY")
+        parser.add_argument('--previous-token-key', default=os.environ.get('PREVIOUS_VOTE_TOKEN_KEY', ''),
+                            help="The VOTE_TOKEN_KEY the votes were stored under "
+                                 "(default: $PREVIOUS_VOTE_TOKEN_KEY, which keeps it out of shell history)")
+
+    def handle(self, *args, **options):
+        if options['retoken']:
+            return self.retoken(options['previous_token_key'])
+
+        keyring = get_fernet()
+        newest = Fernet(vote_encryption_keys()[0])
+        last_id = options['after_id']
+        rotated = skipped = 0
+
+        while True:
+            batch = list(
+                Vote.objects.filter(id__gt=last_id).exclude(audit_payload='')
+                .order_by('id').only('id', 'audit_payload')[:options['batch_size']]
+            )
+            if not batch:
+                break
+
+            to_update = []
+            for vote in batch:
+                token = vote.audit_payload.encode()
+                try:
+                    newest.decrypt(token)
+                except InvalidToken:
+                    try:
+                        vote.audit_payload = keyring.rotate(token).decode()
+                    except InvalidToken:
+                        raise CommandError(
+                            f"Vote {vote.id} cannot be decrypted with any key in VOTE_ENCRYPTION_KEYS; "
+                            f"fix the keyring and resume with --after-id {last_id}."
+                        )
+                    to_update.append(vote)
+                else:
+                    skipped += 1
+            with transaction.atomic():
+                Vote.objects.bulk_update(to_update, ['audit_payload'])
+
+            rotated += len(to_update)
+            last_id = batch[-1].id
+            self.stdout.write(f"  up to vote {last_id}: {rotated:,} re-encrypted, {skipped:,} already current")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {rotated:,} payload(s) re-encrypted, {skipped:,} already current."))
+
+    def retoken(self, previous_key):
+        if not previous_key:
+            raise CommandError("--retoken needs the previous key (--previous-token-key or PREVIOUS_VOTE_TOKEN_KEY).")
+
+        # One indexed UPDATE per candidate; votes already under the current
+        # key no longer match the old token, so a rerun changes nothing
+        moved = 0
+        candidates = Candidate.objects.values_list('id', 'position__election_id').order_by('id')
+        for candidate_id, election_id in candidates.iterator():
+            moved += Vote.objects.filter(
+                election_id=election_id, candidate_encrypted=candidate_token(candidate_id, previous_key)
+            ).update(candidate_encrypted=candidate_token(candidate_id))
+        self.stdout.write(self.style.SUCCESS(f"Done: {moved:,} vote(s) moved to the current token key."))
@@ -0,0 +1,100 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+# Files named after the SHA-256 of their content (elections.storage,
+# elections.photos) never change, so clients may keep them forever
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{64}(_\w+)?\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _byte_range(header, size):
+    """
+    (start, end) of a single 'bytes=' range, None to send the whole file,
+    or False when the range cannot be satisfied.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges: sending everything is allowed
+        return None
+    first, last = match.groups()
+    if not first:
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators, byte ranges and
+    long-lived caching for content-addressed names. When MEDIA_SENDFILE is
+    set only the headers are produced and the front-end server sends the
+    bytes (and handles ranges) itself.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("No such file.")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("No such file.")
+    if not os.path.isfile(full_path):
+        raise Http404("No such file.")
+
+    name = os.path.basename(path)
+    immutable = bool(CONTENT_ADDRESSED.search(path))
+    etag = quote_etag(name.split('.')[0] if immutable else f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE if immutable else f'public, max-age={settings.MEDIA_MAX_AGE}',
+        'Accept-Ranges': 'bytes',
+    }
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime), response=HttpResponse(headers=headers)
+    )
+    if response.status_code == 304:
+        return response
+
+    content_type, encoding = mimetypes.guess_type(name)
+    if encoding or not content_type:
+        # Compressed archives are downloads, not transfer-encoded content
+        content_type = 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + path
+        return HttpResponse(content_type=content_type, headers=headers)
+    if settings.MEDIA_SENDFILE == 'x-sendfile':
+        headers['X-Sendfile'] = full_path
+        return HttpResponse(content_type=content_type, headers=headers)
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = _byte_range(request.META['HTTP_RANGE'], stat.st_size)
+    if byte_range is False:
+        return HttpResponse(status=416, headers={'Content-Range': f'bytes */{stat.st_size}'})
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+
+    start, end = byte_range
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start + 1)
+    headers['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    return HttpResponse(data, content_type=content_type, status=206, headers=headers)
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='candidate_encrypted',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'candidate_encrypted'], name='vote_election_candidate_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:38
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    Candidate = apps.get_model('elections', 'Candidate')
+    CandidateTally = apps.get_model('elections', 'CandidateTally')
+    Vote = apps.get_model('elections', 'Vote')
+
+    counts = {
+        (election_id, digest): count
+        for election_id, digest, count in Vote.objects.values('election_id', 'candidate_encrypted')
+        .annotate(count=Count('id')).order_by().values_list('election_id', 'candidate_encrypted', 'count')
+    }
+    CandidateTally.objects.bulk_create([
+        CandidateTally(
+            election_id=election_id,
+            position_id=position_id,
+            candidate_id=candidate_id,
+            count=counts.get((election_id, hashlib.sha256(str(candidate_id).encode()).hexdigest()), 0),
+        )
+        for candidate_id, position_id, election_id in Candidate.objects.values_list(
+            'id', 'position_id', 'position__election_id'
+        )
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_vote_tally_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('candidate', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tally', to='elections.candidate')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='elections.election')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='elections.position')),
+            ],
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
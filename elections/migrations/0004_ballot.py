@@ -0,0 +1,83 @@
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def create_ballots(apps, schema_editor):
+    """
+    Before ballots existed each voter had exactly one Vote per election;
+    give every such vote its own Ballot and the position of its candidate.
+    """
+    Ballot = apps.get_model('elections', 'Ballot')
+    Candidate = apps.get_model('elections', 'Candidate')
+    Vote = apps.get_model('elections', 'Vote')
+
+    position_by_digest = {
+        hashlib.sha256(str(candidate_id).encode()).hexdigest(): position_id
+        for candidate_id, position_id in Candidate.objects.values_list('id', 'position_id')
+    }
+
+    # A chunk at a time: its votes get a ballot and drop out of the filter
+    while True:
+        votes = list(Vote.objects.filter(ballot__isnull=True).order_by('pk')[:BATCH_SIZE])
+        if not votes:
+            break
+        ballots = Ballot.objects.bulk_create([
+            Ballot(election_id=vote.election_id, voter_hash=vote.voter_hash) for vote in votes
+        ])
+        # bulk_create applies auto_now_add; bulk_update writes the values as given
+        for vote, ballot in zip(votes, ballots):
+            ballot.timestamp = vote.timestamp
+            vote.ballot = ballot
+            vote.position_id = position_by_digest.get(vote.candidate_encrypted)
+        Ballot.objects.bulk_update(ballots, ['timestamp'])
+        Vote.objects.bulk_update(votes, ['ballot', 'position'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0003_candidatetally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('voter_hash', models.CharField(max_length=64)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ballots', to='elections.election')),
+            ],
+            options={
+                'unique_together': {('election', 'voter_hash')},
+            },
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='ballot',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='elections.ballot'),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='position',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='elections.position'),
+        ),
+        migrations.RunPython(create_ballots, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together={('ballot', 'position')},
+        ),
+        migrations.RemoveField(
+            model_name='vote',
+            name='voter_hash',
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='ballot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votes', to='elections.ballot'),
+        ),
+    ]
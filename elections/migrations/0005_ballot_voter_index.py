@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0004_ballot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ballot',
+            index=models.Index(fields=['voter_hash'], name='ballot_voter_idx'),
+        ),
+    ]
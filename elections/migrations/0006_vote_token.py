@@ -0,0 +1,54 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations, models
+
+
+def _legacy_digest(candidate_id):
+    return hashlib.sha256(str(candidate_id).encode()).hexdigest()
+
+
+def _token(candidate_id):
+    # Same as elections.utils.candidate_token at the time of this migration
+    return hmac.new(
+        settings.VOTE_TOKEN_KEY.encode(), f'candidate:{candidate_id}'.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def _convert(apps, old, new):
+    Candidate = apps.get_model('elections', 'Candidate')
+    Vote = apps.get_model('elections', 'Vote')
+    # One indexed UPDATE per candidate
+    for candidate_id, election_id in Candidate.objects.values_list('id', 'position__election_id'):
+        Vote.objects.filter(election_id=election_id, candidate_encrypted=old(candidate_id)).update(
+            candidate_encrypted=new(candidate_id)
+        )
+
+
+def retoken_votes(apps, schema_editor):
+    if not settings.VOTE_TOKEN_KEY and apps.get_model('elections', 'Vote').objects.exists():
+        # Tokens written now must match the key the app runs with later
+        raise ImproperlyConfigured("Set VOTE_TOKEN_KEY before running this migration on existing votes.")
+    _convert(apps, _legacy_digest, _token)
+
+
+def restore_digests(apps, schema_editor):
+    _convert(apps, _token, _legacy_digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0005_ballot_voter_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='audit_payload',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(retoken_votes, restore_digests),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0006_vote_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
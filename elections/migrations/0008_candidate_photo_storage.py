@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 20:16
+
+import elections.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0007_candidate_photo_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='candidate',
+            name='photo',
+            field=models.ImageField(storage=elections.storage.photo_storage, upload_to='candidates/'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils import timezone
-from .utils import encrypt_vote, decrypt_vote
+from .photos import process_upload
+from .storage import photo_storage
+from .utils import candidate_token, decrypt_vote, protect_vote
 import hashlib
 
 
@@ -9,10 +11,24 @@ class Election(models.Model):
     description = models.TextField()
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    # Bumped whenever the ballot or the tallies change other than by a vote
+    # (see elections.caching), so every process notices its cached copies
+    # are stale on the next request that loads the election
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # cache_version is only ever changed by an UPDATE; an edit form
+            # holding an older copy must not write it back
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'cache_version'
+            ]
+        super().save(*args, **kwargs)
+
     def is_active(self):
         now = timezone.now()
         return self.start_time <= now <= self.end_time
@@ -37,24 +53,83 @@ class Candidate(models.Model):
         related_name='candidates'
     )
     name = models.CharField(max_length=255)
-    photo = models.ImageField(upload_to='candidates/')
+    # Stored by content hash: candidates sharing an image share one file
+    photo = models.ImageField(upload_to='candidates/', storage=photo_storage)
+    # SHA-256 of the stored photo; names its thumbnails (see elections.photos)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False)
     manifesto = models.TextField(blank=True)
 
     def __str__(self):
         return f"{self.name} ({self.position.title})"
 
+    def save(self, *args, **kwargs):
+        if self.photo and not self.photo._committed:
+            # A new upload: strip metadata and build thumbnails before storing it
+            self.photo_hash = process_upload(self.photo)
+        elif not self.photo:
+            self.photo_hash = ''
+        super().save(*args, **kwargs)
 
-class Vote(models.Model):
-    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+
+class Ballot(models.Model):
+    """
+    One submitted ballot per voter per election. The individual
+    selections are stored as Vote rows pointing back to it.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='ballots')
     voter_hash = models.CharField(max_length=64)
-    candidate_encrypted = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ('election', 'voter_hash')
+        indexes = [
+            # Looks up every election a voter has taken part in
+            models.Index(fields=['voter_hash'], name='ballot_voter_idx'),
+        ]
+
+
+class Vote(models.Model):
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    ballot = models.ForeignKey(Ballot, on_delete=models.CASCADE, related_name='votes')
+    # Null only for votes recorded before ballots existed whose candidate
+    # has since been deleted
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, null=True, related_name='votes')
+    # Keyed token of the candidate (elections.utils.candidate_token)
+    candidate_encrypted = models.CharField(max_length=64)
+    # Fernet-encrypted candidate id, only kept with VOTE_AUDIT_ENCRYPTION
+    audit_payload = models.TextField(blank=True, default='')
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('ballot', 'position')
+        indexes = [
+            # Serves the per-election GROUP BY candidate_encrypted tally
+            models.Index(fields=['election', 'candidate_encrypted'], name='vote_election_candidate_idx'),
+        ]
 
     def set_candidate(self, candidate_id):
-        self.candidate_encrypted = encrypt_vote(str(candidate_id))
+        self.candidate_encrypted, self.audit_payload = protect_vote(candidate_id)
 
     def get_candidate_id(self):
-        return int(decrypt_vote(self.candidate_encrypted))
+        if self.audit_payload:
+            return int(decrypt_vote(self.audit_payload))
+        # Tokens are one-way: find the candidate of this election it matches
+        candidate_ids = Candidate.objects.filter(position__election_id=self.election_id).values_list('id', flat=True)
+        for candidate_id in candidate_ids:
+            if candidate_token(candidate_id) == self.candidate_encrypted:
+                return candidate_id
+        return None
+
+
+class CandidateTally(models.Model):
+    """
+    Running vote count per candidate, incremented in the same transaction
+    that stores each Vote so results never have to count the vote table.
+    """
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name='tallies')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='tallies')
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE, related_name='tally')
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.candidate.name}: {self.count}"
@@ -0,0 +1,138 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Square thumbnails in pixels, twice the largest size each is shown at so
+# they stay sharp on high-density screens: avatars in lists and tables
+# (up to 56px), ballot cards and admin previews (140px) and the manifesto
+# modal (120px)
+THUMBNAIL_SIZES = {
+    'avatar': 112,
+    'card': 288,
+    'modal': 240,
+}
+
+# extension: (Pillow format, save options)
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def photo_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def thumbnail_name(content_hash, size, ext):
+    return f'candidates/thumbs/{content_hash[:2]}/{content_hash}_{size}.{ext}'
+
+
+def strip_metadata(data):
+    """
+    Return the image bytes without EXIF (camera details, GPS position),
+    with any orientation tag applied to the pixels first. Images without
+    EXIF come back unchanged.
+    """
+    image = Image.open(BytesIO(data))
+    if not image.getexif():
+        return data
+    image_format = image.format
+    image = ImageOps.exif_transpose(image)
+    out = BytesIO()
+    if image_format in ('JPEG', 'MPO'):
+        image.save(out, 'JPEG', quality=95, icc_profile=image.info.get('icc_profile'))
+    else:
+        image.save(out, image_format)
+    return out.getvalue()
+
+
+def render_thumbnails(data):
+    """
+    {(size, ext): bytes} for every thumbnail size and format. Needs no
+    database or storage, so it can run in a worker process.
+    """
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    if image.mode != 'RGB':
+        # Flatten transparency onto white; JPEG has no alpha channel
+        background = Image.new('RGB', image.size, 'white')
+        image = image.convert('RGBA')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+
+    thumbnails = {}
+    for size, pixels in THUMBNAIL_SIZES.items():
+        thumbnail = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+        for ext, (image_format, options) in THUMBNAIL_FORMATS.items():
+            out = BytesIO()
+            thumbnail.save(out, image_format, **options)
+            thumbnails[size, ext] = out.getvalue()
+    return thumbnails
+
+
+def save_thumbnails(content_hash, data=None, thumbnails=None, force=False):
+    """
+    Store the thumbnails of an image unless a photo with the same content
+    already has them (force renders and replaces them anyway). Pass
+    pre-rendered thumbnails or the image data.
+    """
+    names = {
+        (size, ext): thumbnail_name(content_hash, size, ext)
+        for size in THUMBNAIL_SIZES for ext in THUMBNAIL_FORMATS
+    }
+    missing = names if force else {key: name for key, name in names.items() if not default_storage.exists(name)}
+    if not missing:
+        return
+    if thumbnails is None:
+        thumbnails = render_thumbnails(data)
+    for key, name in missing.items():
+        if force:
+            # save() never overwrites; it would pick another name
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(thumbnails[key]))
+
+
+def prepare_photo(data):
+    """
+    (content hash, stored bytes, thumbnails) for an image, or None if it
+    cannot be read. Touches neither database nor storage, so bulk imports
+    run it in worker processes and store the results afterwards.
+    """
+    try:
+        data = strip_metadata(data)
+        return photo_hash(data), data, render_thumbnails(data)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def process_upload(photo):
+    """
+    Prepare a newly uploaded Candidate.photo before it is stored: strip its
+    metadata, generate its thumbnails and return its content hash.
+    """
+    photo.seek(0)
+    data = strip_metadata(photo.read())
+    content_hash = photo_hash(data)
+    save_thumbnails(content_hash, data)
+    photo.save(photo.name, ContentFile(data), save=False)
+    return content_hash
+
+
+def delete_thumbnails(content_hash):
+    for size in THUMBNAIL_SIZES:
+        for ext in THUMBNAIL_FORMATS:
+            default_storage.delete(thumbnail_name(content_hash, size, ext))
+
+
+def thumbnail_url(candidate, size='avatar', ext='webp'):
+    """
+    URL of a candidate's thumbnail; the original for photos stored before
+    thumbnails existed (see manage.py build_thumbnails), '' without one.
+    """
+    if not candidate.photo:
+        return ''
+    if not candidate.photo_hash:
+        return candidate.photo.url
+    return default_storage.url(thumbnail_name(candidate.photo_hash, size, ext))
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import bump_cache_version, invalidate_results
+from .models import Election, Position, Candidate
+from .photos import delete_thumbnails
+from .storage import photo_storage
+
+
+def _election_changed(election_id):
+    bump_cache_version(election_id)
+    invalidate_results(election_id)
+
+
+@receiver(post_save, sender=Election)
+def election_changed(sender, instance, **kwargs):
+    _election_changed(instance.id)
+
+
+@receiver(post_delete, sender=Election)
+def election_deleted(sender, instance, **kwargs):
+    invalidate_results(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Position)
+def position_changed(sender, instance, **kwargs):
+    _election_changed(instance.election_id)
+
+
+@receiver([post_save, post_delete], sender=Candidate)
+def candidate_changed(sender, instance, **kwargs):
+    # Look the election up by id: during a cascading delete the position
+    # may already be gone, in which case its own signal has done the work
+    election_id = Position.objects.filter(id=instance.position_id).values_list('election_id', flat=True).first()
+    if election_id is not None:
+        _election_changed(election_id)
+
+
+def _release_photo(name, content_hash):
+    # Photos are shared by content, so a file only goes once no candidate
+    # refers to it any more
+    if name and not Candidate.objects.filter(photo=name).exists():
+        photo_storage().delete(name)
+    if content_hash and not Candidate.objects.filter(photo_hash=content_hash).exists():
+        delete_thumbnails(content_hash)
+
+
+@receiver(pre_save, sender=Candidate)
+def remember_replaced_photo(sender, instance, **kwargs):
+    instance._replaced_photo = None
+    if instance.pk:
+        previous = Candidate.objects.filter(pk=instance.pk).values_list('photo', 'photo_hash').first()
+        if previous and previous[0] != instance.photo.name:
+            instance._replaced_photo = previous
+
+
+@receiver(post_save, sender=Candidate)
+def release_replaced_photo(sender, instance, **kwargs):
+    replaced = getattr(instance, '_replaced_photo', None)
+    if replaced:
+        transaction.on_commit(lambda: _release_photo(*replaced))
+
+
+@receiver(post_delete, sender=Candidate)
+def release_deleted_photo(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _release_photo(instance.photo.name, instance.photo_hash))
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each file as <upload_to>/<sha256[:2]>/<sha256><ext>, so saving
+    the same content twice keeps a single physical file and the name
+    returned for both saves is the same. Whether a file is still needed is
+    decided by the rows that reference it (see elections.photos).
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Names are never taken over by different content, so there is
+        # nothing to make unique
+        return name
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        dirname = os.path.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        return f'{dirname}/{digest[:2]}/{digest}{ext}' if dirname else f'{digest[:2]}/{digest}{ext}'
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary file and rename it into place: two uploads of
+        # the same image racing each other both end up with a complete file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode if self.file_permissions_mode is not None else 0o644)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+
+_photo_storage = None
+
+
+def photo_storage():
+    """
+    Storage for Candidate.photo (a callable so migrations keep a reference
+    rather than a copy of its settings).
+    """
+    global _photo_storage
+    if _photo_storage is None:
+        _photo_storage = ContentAddressedStorage()
+    return _photo_storage
@@ -0,0 +1,147 @@
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.utils import timezone
+from .models import Ballot, Candidate, CandidateTally, Position, Vote
+from .utils import candidate_token
+
+
+def count_votes(election):
+    """
+    Return {candidate_token: count} for an election using a single
+    GROUP BY candidate_encrypted query.
+    """
+    rows = (
+        Vote.objects.filter(election=election)
+        .values_list('candidate_encrypted')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    return dict(rows)
+
+
+def recount_votes(election):
+    """
+    Recompute {candidate_id: count} from the raw Vote rows.
+    """
+    counts = count_votes(election)
+    candidate_ids = Candidate.objects.filter(position__election=election).values_list('id', flat=True)
+    return {
+        candidate_id: counts.get(candidate_token(candidate_id), 0)
+        for candidate_id in candidate_ids
+    }
+
+
+def record_votes(election, candidates):
+    """
+    Add one vote to the running tally for each entry in candidates (a
+    candidate listed twice gets two). Call inside the transaction that
+    saves the Vote rows so both commit together.
+    """
+    increments = Counter(candidate.id for candidate in candidates)
+
+    # Make sure every tally row exists (ON CONFLICT DO NOTHING), then bump
+    # them with one UPDATE per distinct increment - a single UPDATE for a
+    # lone ballot
+    CandidateTally.objects.bulk_create([
+        CandidateTally(election=election, position_id=candidate.position_id, candidate=candidate)
+        for candidate in {candidate.id: candidate for candidate in candidates}.values()
+    ], ignore_conflicts=True)
+    by_increment = defaultdict(list)
+    for candidate_id, increment in increments.items():
+        by_increment[increment].append(candidate_id)
+    for increment, candidate_ids in by_increment.items():
+        CandidateTally.objects.filter(candidate_id__in=candidate_ids).update(count=F('count') + increment)
+
+
+def tally_election(election):
+    """
+    Compute the results for every position of an election.
+
+    Counts come from the CandidateTally table, so the candidate figures
+    cost three indexed queries no matter how many votes exist; turnout adds
+    a count of ballots and of eligible (non-admin) users. Percentages are
+    shares of each position's own total. The returned dict can be passed
+    straight to the results template and is the shared source for any
+    export or API output.
+    """
+    positions = list(Position.objects.filter(election=election).order_by('id'))
+    candidates = Candidate.objects.filter(position__election=election).order_by('id')
+
+    counts = {}
+    position_totals = Counter()
+    for position_id, candidate_id, count in (
+        CandidateTally.objects.filter(election=election).values_list('position_id', 'candidate_id', 'count')
+    ):
+        counts[candidate_id] = count
+        position_totals[position_id] += count
+
+    candidates_by_position = {position.id: [] for position in positions}
+    for candidate in candidates:
+        count = counts.get(candidate.id, 0)
+        total = position_totals[candidate.position_id]
+        candidates_by_position[candidate.position_id].append({
+            'candidate': candidate,
+            'count': count,
+            'percentage': (count / total) * 100 if total else 0,
+        })
+
+    results_by_position = [
+        {
+            'position': position,
+            'candidates': candidates_by_position[position.id],
+            'total_votes': position_totals[position.id],
+        }
+        for position in positions
+    ]
+
+    ballots_cast = Ballot.objects.filter(election=election).count()
+    eligible_voters = get_user_model().objects.exclude(role='admin').count()
+
+    return {
+        'election': election,
+        'results_by_position': results_by_position,
+        'total_votes': sum(position_totals.values()),
+        'ballots_cast': ballots_cast,
+        'eligible_voters': eligible_voters,
+        'turnout': (ballots_cast / eligible_voters) * 100 if eligible_voters else 0,
+        'as_of': timezone.now(),
+    }
+
+
+def results_payload(results):
+    """
+    Plain JSON-serialisable form of tally_election() output.
+    """
+    election = results['election']
+    return {
+        'election': {
+            'id': election.id,
+            'title': election.title,
+            'start_time': election.start_time.isoformat(),
+            'end_time': election.end_time.isoformat(),
+        },
+        'as_of': results['as_of'].isoformat(),
+        'total_votes': results['total_votes'],
+        'ballots_cast': results['ballots_cast'],
+        'eligible_voters': results['eligible_voters'],
+        'turnout': round(results['turnout'], 2),
+        'positions': [
+            {
+                'id': group['position'].id,
+                'title': group['position'].title,
+                'total_votes': group['total_votes'],
+                'candidates': [
+                    {
+                        'id': r['candidate'].id,
+                        'name': r['candidate'].name,
+                        'count': r['count'],
+                        'percentage': round(r['percentage'], 2),
+                    }
+                    for r in group['candidates']
+                ],
+            }
+            for group in results['results_by_position']
+        ],
+    }
@@ -0,0 +1,43 @@
+# elections/templatetags/candidate_photos.py
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from elections.photos import THUMBNAIL_SIZES, thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(candidate, spec='avatar'):
+    """
+    {{ candidate|thumbnail:"card" }} -> WebP thumbnail URL,
+    {{ candidate|thumbnail:"card.jpg" }} -> JPEG.
+    """
+    size, _, ext = spec.partition('.')
+    return thumbnail_url(candidate, size, ext or 'webp')
+
+
+@register.simple_tag
+def candidate_photo(candidate, size='avatar', default='', **attrs):
+    """
+    <picture> with the WebP thumbnail and a JPEG fallback, e.g.
+    {% candidate_photo candidate "card" class="shadow" alt=candidate.name %}.
+    Renders <img src="default"> (or nothing) for candidates without a photo.
+    """
+    attrs.setdefault('alt', candidate.name)
+    attrs.setdefault('loading', 'lazy')
+    if not candidate.photo:
+        return format_html('<img src="{}"{}>', default, flatatt(attrs)) if default else ''
+    if not candidate.photo_hash:
+        return format_html('<img src="{}"{}>', candidate.photo.url, flatatt(attrs))
+
+    pixels = THUMBNAIL_SIZES[size]
+    attrs.setdefault('width', pixels)
+    attrs.setdefault('height', pixels)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp"><img src="{}"{}></picture>',
+        thumbnail_url(candidate, size, 'webp'),
+        thumbnail_url(candidate, size, 'jpg'),
+        flatatt(attrs),
+    )
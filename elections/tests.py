@@ -1,3 +1,870 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from cryptography.fernet import Fernet
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .caching import bump_cache_version, get_results, invalidate_results
+from .ingest import BallotQueue
+from .live import TallyBroadcaster, compact_results, stream_results
+from .models import Election, Position, Candidate, Ballot, Vote, CandidateTally
+from .photos import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, thumbnail_name
+from .tally import tally_election
+from .utils import candidate_token, decrypt_vote, encrypt_vote, load_keys
+from .voting import cast_ballot, cast_ballots, get_voter_hash
+
+
+class ElectionTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.election = Election.objects.create(
+            title='Student Council',
+            description='Annual election',
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+        )
+        self.voter = get_user_model().objects.create_user('voter', password='secret-pass-123')
+        self.client.force_login(self.voter)
+
+    def add_position(self, title, candidates=2):
+        position = Position.objects.create(title=title, election=self.election)
+        for i in range(candidates):
+            Candidate.objects.create(position=position, name=f'{title} candidate {i}', photo='candidates/test.png')
+        return position
+
+
+class ElectionListTests(ElectionTestCase):
+    def add_election(self, title, start, end, candidates=2):
+        election = Election.objects.create(title=title, description='', start_time=start, end_time=end)
+        for position_title in ('President', 'Secretary'):
+            position = Position.objects.create(title=position_title, election=election)
+            for i in range(candidates):
+                Candidate.objects.create(position=position, name=f'{title} {position_title} {i}', photo='candidates/test.png')
+        return election
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('election_list'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_elections(self):
+        now = timezone.now()
+        self.add_election('First', now, now + timedelta(days=1))
+        self.client.get(reverse('election_list'))  # fills the session
+        baseline = self.count_list_queries()
+
+        for i in range(5):
+            self.add_election(f'Extra {i}', now, now + timedelta(days=1), candidates=4)
+
+        self.assertEqual(self.count_list_queries(), baseline)
+
+    def test_status_filter(self):
+        now = timezone.now()
+        upcoming = self.add_election('Upcoming', now + timedelta(days=1), now + timedelta(days=2))
+        closed = self.add_election('Closed', now - timedelta(days=2), now - timedelta(days=1))
+
+        def listed(status):
+            response = self.client.get(reverse('election_list'), {'status': status})
+            return {election.id for election in response.context['elections']}
+
+        self.assertEqual(listed('active'), {self.election.id})
+        self.assertEqual(listed('upcoming'), {upcoming.id})
+        self.assertEqual(listed('closed'), {closed.id})
+        self.assertEqual(listed('all'), {self.election.id, upcoming.id, closed.id})
+        self.assertEqual(listed('bogus'), listed('all'))
+
+    def test_card_shows_five_avatars_and_the_rest_as_a_count(self):
+        Election.objects.all().delete()
+        now = timezone.now()
+        self.add_election('Crowded', now, now + timedelta(days=1), candidates=7)
+
+        response = self.client.get(reverse('election_list'))
+
+        self.assertEqual(response.context['elections'][0].total_candidates, 14)
+        self.assertContains(response, 'class="brand-squircle-avatar', count=5)
+        self.assertContains(response, '+9')
+
+
+class VoteViewTests(ElectionTestCase):
+    def count_ballot_queries(self):
+        # Measure an uncached ballot load
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('vote', args=[self.election.id]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_ballot_query_count_does_not_grow_with_positions(self):
+        self.add_position('President')
+        self.client.get(reverse('vote', args=[self.election.id]))  # fills the session
+        baseline = self.count_ballot_queries()
+
+        for title in ('Secretary', 'Treasurer', 'Sports', 'Culture'):
+            self.add_position(title, candidates=4)
+
+        self.assertEqual(self.count_ballot_queries(), baseline)
+
+    def test_ballot_renders_every_position_and_candidate(self):
+        president = self.add_position('President')
+        self.add_position('Secretary', candidates=3)
+
+        response = self.client.get(reverse('vote', args=[self.election.id]))
+
+        self.assertContains(response, f'name="position_{president.id}"', count=2)
+        self.assertContains(response, 'Secretary candidate 2')
+
+    def test_editing_a_candidate_refreshes_the_cached_ballot(self):
+        candidate = self.add_position('President').candidates.first()
+        url = reverse('vote', args=[self.election.id])
+        self.client.get(url)
+
+        candidate.name = 'Renamed in this process'
+        candidate.save()
+        self.assertContains(self.client.get(url), 'Renamed in this process')
+
+        # Another process (a command, another worker) cannot reach this
+        # process's cache; bumping the version in the database is enough
+        Candidate.objects.filter(id=candidate.id).update(name='Renamed elsewhere')
+        bump_cache_version(self.election.id)
+        self.assertContains(self.client.get(url), 'Renamed elsewhere')
+
+    def test_vote_for_a_removed_candidate_asks_to_vote_again(self):
+        position = self.add_position('President')
+        url = reverse('vote', args=[self.election.id])
+
+        with mock.patch('elections.views.submit_ballot', side_effect=IntegrityError):
+            response = self.client.post(url, {f'position_{position.id}': position.candidates.first().id})
+
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertNotIn(self.election.id, self.client.session.get('voted_elections', []))
+
+    def test_vote_still_being_committed_is_checked_again(self):
+        position = self.add_position('President')
+        url = reverse('vote', args=[self.election.id])
+        self.client.get(url)  # fills the session
+
+        with mock.patch('elections.views.submit_ballot', side_effect=TimeoutError):
+            response = self.client.post(url, {f'position_{position.id}': position.candidates.first().id})
+
+        self.assertRedirects(response, reverse('election_list'), fetch_redirect_response=False)
+        self.assertNotIn('voted_elections', self.client.session)
+
+        # The writer committed it after all
+        cast_ballot(self.election, get_voter_hash(self.voter), [position.candidates.first()])
+        self.assertRedirects(self.client.get(url), reverse('election_list'), fetch_redirect_response=False)
+
+
+class BatchedVotingTests(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidate = self.add_position('President').candidates.first()
+
+    def test_duplicates_in_a_batch_store_one_ballot(self):
+        ballots = cast_ballots([
+            (self.election, 'voter-1', [self.candidate]),
+            (self.election, 'voter-1', [self.candidate]),
+            (self.election, 'voter-2', [self.candidate]),
+        ])
+
+        self.assertIsNotNone(ballots[0])
+        self.assertIsNone(ballots[1])
+        self.assertEqual(ballots[2].voter_hash, 'voter-2')
+        self.assertEqual(Ballot.objects.count(), 2)
+        self.assertEqual(CandidateTally.objects.get(candidate=self.candidate).count, 2)
+
+    def test_voter_who_already_voted_does_not_sink_the_batch(self):
+        cast_ballot(self.election, 'voter-1', [self.candidate])
+
+        ballots = cast_ballots([
+            (self.election, 'voter-1', [self.candidate]),
+            (self.election, 'voter-2', [self.candidate]),
+        ])
+
+        self.assertIsNone(ballots[0])
+        self.assertEqual(ballots[1].voter_hash, 'voter-2')
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(CandidateTally.objects.get(candidate=self.candidate).count, 2)
+
+
+class BallotQueueTests(SimpleTestCase):
+    def submit_all(self, ballot_queue, voters):
+        with ThreadPoolExecutor(len(voters)) as pool:
+            futures = [pool.submit(ballot_queue.submit, None, voter, []) for voter in voters]
+            return [future.exception() or future.result() for future in futures]
+
+    def test_submissions_are_committed_in_one_batch(self):
+        with mock.patch('elections.ingest.cast_ballots', side_effect=lambda batch: [voter for _, voter, _ in batch]) as cast:
+            results = self.submit_all(BallotQueue(batch_size=3, flush_interval=5), ['a', 'b', 'c'])
+
+        self.assertEqual(results, ['a', 'b', 'c'])
+        cast.assert_called_once()
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        error = IntegrityError('candidate removed')
+
+        def cast_ballot(election, voter, candidates):
+            if voter == 'bad':
+                raise error
+            return voter
+
+        with mock.patch('elections.ingest.cast_ballots', side_effect=error), \
+                mock.patch('elections.ingest.cast_ballot', side_effect=cast_ballot):
+            results = self.submit_all(BallotQueue(batch_size=3, flush_interval=5), ['a', 'bad', 'b'])
+
+        self.assertEqual(results, ['a', error, 'b'])
+
+    def test_waiter_gives_up_after_timeout(self):
+        release = threading.Event()
+        with mock.patch('elections.ingest.cast_ballots', side_effect=lambda batch: release.wait(5) and [None]), \
+                mock.patch('elections.ingest.SUBMIT_TIMEOUT', 0.05):
+            with self.assertRaises(TimeoutError):
+                BallotQueue(batch_size=1, flush_interval=0).submit(None, 'a', [])
+            release.set()
+
+
+class TallyElectionTests(ElectionTestCase):
+    def vote(self, username, candidates):
+        voter = get_user_model().objects.create_user(username, password='secret-pass-123')
+        cast_ballot(self.election, get_voter_hash(voter), candidates)
+
+    def test_percentages_are_per_position(self):
+        president = list(self.add_position('President').candidates.order_by('id'))
+        secretary = list(self.add_position('Secretary', candidates=3).candidates.order_by('id'))
+        self.vote('a', [president[0], secretary[0]])
+        self.vote('b', [president[0], secretary[1]])
+        self.vote('c', [president[1], secretary[1]])
+        self.vote('d', [president[0]])  # skipped the second position
+
+        results = tally_election(self.election)
+
+        first, second = results['results_by_position']
+        self.assertEqual(first['total_votes'], 4)
+        self.assertEqual([r['percentage'] for r in first['candidates']], [75, 25])
+        self.assertEqual(second['total_votes'], 3)
+        self.assertEqual(
+            [round(r['percentage'], 2) for r in second['candidates']], [33.33, 66.67, 0]
+        )
+        self.assertEqual(results['total_votes'], 7)
+
+    def test_turnout_counts_ballots_not_selections(self):
+        president = self.add_position('President').candidates.first()
+        secretary = self.add_position('Secretary').candidates.first()
+        self.vote('a', [president, secretary])
+        get_user_model().objects.create_user('admin', password='secret-pass-123', role='admin')
+
+        results = tally_election(self.election)
+
+        # Two non-admin users (self.voter and 'a'), one of whom voted
+        self.assertEqual(results['ballots_cast'], 1)
+        self.assertEqual(results['eligible_voters'], 2)
+        self.assertEqual(results['turnout'], 50)
+
+    def test_positions_without_votes(self):
+        self.add_position('President')
+        self.add_position('Secretary')
+
+        results = tally_election(self.election)
+
+        for group in results['results_by_position']:
+            self.assertEqual(group['total_votes'], 0)
+            self.assertEqual([r['percentage'] for r in group['candidates']], [0, 0])
+        self.assertEqual(results['turnout'], 0)
+
+
+class VoteProtectionTests(ElectionTestCase):
+    def cast(self):
+        candidate = self.add_position('President').candidates.last()
+        cast_ballot(self.election, get_voter_hash(self.voter), [candidate])
+        return candidate, Vote.objects.get()
+
+    def test_token_is_keyed_and_resolves(self):
+        candidate, vote = self.cast()
+
+        self.assertEqual(vote.candidate_encrypted, candidate_token(candidate.id))
+        self.assertNotEqual(vote.candidate_encrypted, hashlib.sha256(str(candidate.id).encode()).hexdigest())
+        self.assertEqual(vote.audit_payload, '')
+        self.assertEqual(vote.get_candidate_id(), candidate.id)
+        with self.settings(VOTE_TOKEN_KEY='another-key'):
+            self.assertNotEqual(candidate_token(candidate.id), vote.candidate_encrypted)
+
+    @override_settings(VOTE_AUDIT_ENCRYPTION=True)
+    def test_audit_payload_decrypts_to_candidate(self):
+        candidate, vote = self.cast()
+
+        self.assertEqual(vote.candidate_encrypted, candidate_token(candidate.id))
+        self.assertEqual(decrypt_vote(vote.audit_payload), str(candidate.id))
+        self.assertEqual(vote.get_candidate_id(), candidate.id)
+        self.assertEqual(tally_election(self.election)['total_votes'], 1)
+
+
+class VoteKeyTests(ElectionTestCase):
+    old_key = Fernet.generate_key().decode()
+    new_key = Fernet.generate_key().decode()
+
+    @override_settings(VOTE_AUDIT_ENCRYPTION=True)
+    def test_rotate_vote_key_reencrypts_payloads(self):
+        candidates = list(self.add_position('President').candidates.all())
+        with self.settings(VOTE_ENCRYPTION_KEYS=[self.old_key]):
+            for i in range(5):
+                cast_ballot(self.election, f'voter-{i}', [candidates[i % 2]])
+
+        with self.settings(VOTE_ENCRYPTION_KEYS=[self.new_key, self.old_key]):
+            call_command('rotate_vote_key', batch_size=2, stdout=StringIO())
+
+        with self.settings(VOTE_ENCRYPTION_KEYS=[self.new_key]):
+            self.assertEqual(
+                sorted(vote.get_candidate_id() for vote in Vote.objects.all()),
+                sorted(candidates[i % 2].id for i in range(5)),
+            )
+
+    @override_settings(VOTE_ENCRYPTION_KEYS=[])
+    def test_keyring_only_required_for_audit_encryption(self):
+        with self.settings(VOTE_AUDIT_ENCRYPTION=False):
+            load_keys()
+        with self.settings(VOTE_AUDIT_ENCRYPTION=True), self.assertRaises(ImproperlyConfigured):
+            load_keys()
+        with self.assertRaises(ImproperlyConfigured):
+            encrypt_vote('1')
+
+    @override_settings(VOTE_TOKEN_KEY='')
+    def test_missing_token_key_fails(self):
+        with self.assertRaises(ImproperlyConfigured):
+            candidate_token(1)
+
+    def test_retoken_moves_votes_to_new_token_key(self):
+        candidates = list(self.add_position('President').candidates.all())
+        with self.settings(VOTE_TOKEN_KEY='old-token-key'):
+            for i in range(3):
+                cast_ballot(self.election, f'voter-{i}', [candidates[i % 2]])
+
+        with self.settings(VOTE_TOKEN_KEY='new-token-key'):
+            call_command('rotate_vote_key', retoken=True, previous_token_key='old-token-key', stdout=StringIO())
+            self.assertEqual(
+                sorted(vote.get_candidate_id() for vote in Vote.objects.all()),
+                sorted(candidates[i % 2].id for i in range(3)),
+            )
+
+
+class ResultsJsonTests(ElectionTestCase):
+    def test_unchanged_results_answer_304(self):
+        position = self.add_position('President')
+        url = reverse('results_json', args=[self.election.id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['positions'][0]['id'], position.id)
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_recomputed_results_keep_their_etag(self):
+        self.add_position('President')
+        url = reverse('results_json', args=[self.election.id])
+        etag = self.client.get(url)['ETag']
+
+        invalidate_results(self.election.id)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(RESULTS_CACHE_MAX_STALENESS=0)
+    def test_new_vote_changes_etag(self):
+        position = self.add_position('President')
+        url = reverse('results_json', args=[self.election.id])
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_ballot(self.election, get_voter_hash(self.voter), [position.candidates.first()])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['ballots_cast'], 1)
+
+
+class ResultsCacheTests(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidate = self.add_position('President').candidates.first()
+
+    def ballots_cast(self):
+        self.election.refresh_from_db()
+        return get_results(self.election)['ballots_cast']
+
+    @override_settings(RESULTS_CACHE_MAX_STALENESS=60)
+    def test_open_election_serves_snapshot_within_staleness_window(self):
+        self.assertEqual(self.ballots_cast(), 0)
+        cast_ballot(self.election, 'voter-1', [self.candidate])
+        self.assertEqual(self.ballots_cast(), 0)
+
+        with override_settings(RESULTS_CACHE_MAX_STALENESS=0):
+            self.assertEqual(self.ballots_cast(), 1)
+
+    def test_closed_election_recomputes_when_version_changes(self):
+        Election.objects.filter(id=self.election.id).update(end_time=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.ballots_cast(), 0)
+
+        # A ballot committed just before the close, counted after it
+        cast_ballot(self.election, 'voter-1', [self.candidate])
+        self.assertEqual(self.ballots_cast(), 1)
+
+    def test_concurrent_misses_compute_once(self):
+        self.election.refresh_from_db()
+        results = tally_election(self.election)
+
+        def slow_tally(election):
+            computing.set()
+            release.wait(5)
+            return results
+
+        computing, release = threading.Event(), threading.Event()
+        with mock.patch('elections.caching.tally_version', return_value='1:0'), \
+                mock.patch('elections.caching.tally_election', side_effect=slow_tally) as tally, \
+                ThreadPoolExecutor(2) as pool:
+            first = pool.submit(get_results, self.election)
+            computing.wait(5)
+            second = pool.submit(get_results, self.election)
+            release.set()
+            self.assertEqual(first.result(), results)
+            self.assertEqual(second.result(), results)
+        self.assertEqual(tally.call_count, 1)
+
+
+class LiveResultsTests(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidates = list(self.add_position('President').candidates.order_by('id'))
+
+    @override_settings(RESULTS_CACHE_MAX_STALENESS=0)
+    def test_compact_results_follow_votes(self):
+        self.assertEqual(compact_results(self.election.id)['total'], 0)
+        cast_ballot(self.election, 'voter-1', [self.candidates[0]])
+
+        current = compact_results(self.election.id)
+        self.assertEqual(current['total'], 1)
+        self.assertEqual(current['candidates'][str(self.candidates[0].id)], [1, 100.0])
+
+    def test_publish_sends_only_changed_candidates(self):
+        first, second = (str(candidate.id) for candidate in self.candidates)
+        broadcaster = TallyBroadcaster(self.election.id)
+        queue = asyncio.Queue()
+        broadcaster.subscribers.add(queue)
+
+        state = {'total': 1, 'turnout': 50.0, 'candidates': {first: [1, 100.0], second: [0, 0]}}
+        broadcaster.publish(state)
+        broadcaster.publish(state)
+        broadcaster.publish(dict(state, total=2, candidates={first: [1, 50.0], second: [1, 50.0]}))
+        broadcaster.publish(dict(state, total=3, candidates={first: [2, 66.67], second: [1, 33.33]}))
+
+        self.assertTrue(queue.get_nowait()['full'])
+        self.assertEqual(queue.get_nowait()['candidates'], {first: [1, 50.0], second: [1, 50.0]})
+        changed = queue.get_nowait()
+        self.assertEqual((changed['full'], changed['total']), (False, 3))
+        self.assertTrue(queue.empty())
+
+    @override_settings(RESULTS_STREAM_INTERVAL=0)
+    def test_stream_starts_with_full_state(self):
+        state = {'total': 0, 'turnout': 0, 'candidates': {}}
+
+        async def first_message():
+            stream = stream_results(self.election.id)
+            try:
+                return await stream.__anext__()
+            finally:
+                await stream.aclose()
+
+        with mock.patch('elections.live.compact_results', return_value=state):
+            message = asyncio.run(first_message())
+        self.assertEqual(message, 'event: tally\ndata: {"total":0,"turnout":0,"candidates":{},"full":true}\n\n')
+
+    def test_stream_is_refused_under_wsgi(self):
+        response = self.client.get(reverse('results_stream', args=[self.election.id]))
+        self.assertEqual(response.status_code, 204)
+
+
+class ExportTests(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidate = self.add_position('President').candidates.first()
+        cast_ballot(self.election, get_voter_hash(self.voter), [self.candidate])
+
+    def test_results_csv(self):
+        response = self.client.get(reverse('results_export', args=[self.election.id]))
+
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'position_id,position,candidate_id,candidate,votes,percentage')
+        self.assertIn(f'{self.candidate.id},{self.candidate.name},1,100.0', lines[1])
+
+    def test_ledger_is_admin_only(self):
+        url = reverse('ledger_export', args=[self.election.id])
+        self.assertRedirects(self.client.get(url), reverse('election_list'))
+
+        admin = get_user_model().objects.create_user('admin', password='secret-pass-123', role='admin')
+        self.client.force_login(admin)
+        response = self.client.get(url, {'format': 'jsonl'})
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['ballot_id'], Ballot.objects.get().id)
+        self.assertNotIn('voter_hash', rows[0])
+        self.assertEqual(rows[0]['candidate_token'], candidate_token(self.candidate.id))
+
+
+class VerifyTallyTests(ElectionTestCase):
+    def test_reports_drift_between_tally_and_votes(self):
+        candidates = list(self.add_position('President').candidates.order_by('id'))
+        for i in range(5):
+            cast_ballot(self.election, f'voter-{i}', [candidates[i % 2]])
+        call_command('verify_tally', self.election.id, workers=1, stdout=StringIO())
+
+        CandidateTally.objects.filter(candidate=candidates[0]).update(count=F('count') + 1)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_tally', self.election.id, workers=1, stdout=out)
+        self.assertIn('reported 4, recount 3', out.getvalue())
+
+    @override_settings(VOTE_ENCRYPTION_KEYS=[])
+    def test_runs_without_a_keyring(self):
+        candidate = self.add_position('President').candidates.first()
+        for i in range(3):
+            cast_ballot(self.election, f'voter-{i}', [candidate])
+        for workers in (1, 2):
+            call_command('verify_tally', self.election.id, workers=workers, stdout=StringIO())
+
+        # An audit payload cannot be checked without the keyring
+        Vote.objects.filter(id=Vote.objects.first().id).update(audit_payload='unverifiable')
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('verify_tally', self.election.id, workers=1, stdout=out)
+        self.assertIn('1 vote(s) for position', out.getvalue())
+
+
+class RebuildTalliesTests(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.candidates = list(self.add_position('President').candidates.order_by('id'))
+        for i in range(3):
+            cast_ballot(self.election, f'voter-{i}', [self.candidates[0]])
+        CandidateTally.objects.filter(candidate=self.candidates[0]).update(count=5)
+
+    def reported_votes(self):
+        self.election.refresh_from_db()
+        return get_results(self.election)['results_by_position'][0]['candidates'][0]['count']
+
+    def test_dry_run_reports_drift_without_writing(self):
+        self.election.refresh_from_db()
+        version = self.election.cache_version
+        out = StringIO()
+        call_command('rebuild_tallies', self.election.id, dry_run=True, stdout=out)
+
+        self.assertIn(f'candidate {self.candidates[0].id} tally 5, recount 3', out.getvalue())
+        self.assertEqual(CandidateTally.objects.get(candidate=self.candidates[0]).count, 5)
+        self.election.refresh_from_db()
+        self.assertEqual(self.election.cache_version, version)
+
+    def test_corrects_drift_and_refreshes_results(self):
+        Election.objects.filter(id=self.election.id).update(end_time=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.reported_votes(), 5)
+
+        out = StringIO()
+        call_command('rebuild_tallies', self.election.id, stdout=out)
+        self.assertIn('Drift corrected for 1 candidate(s).', out.getvalue())
+        self.assertEqual(CandidateTally.objects.get(candidate=self.candidates[0]).count, 3)
+        self.assertEqual(self.reported_votes(), 3)
+
+        out = StringIO()
+        call_command('rebuild_tallies', self.election.id, stdout=out)
+        self.assertIn('All tallies match the vote table.', out.getvalue())
+
+
+class CandidatePhotoTestCase(ElectionTestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.position = Position.objects.create(title='President', election=self.election)
+
+    def upload(self, name='portrait.jpg'):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        out = BytesIO()
+        Image.new('RGB', (1200, 900), 'red').save(out, 'JPEG', exif=exif)
+        return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+class CandidatePhotoTests(CandidatePhotoTestCase):
+    def test_upload_strips_exif_and_builds_thumbnails(self):
+        candidate = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload())
+
+        with candidate.photo.open('rb') as photo:
+            data = photo.read()
+        self.assertEqual(candidate.photo_hash, hashlib.sha256(data).hexdigest())
+        self.assertFalse(Image.open(BytesIO(data)).getexif())
+        for size, pixels in THUMBNAIL_SIZES.items():
+            for ext in THUMBNAIL_FORMATS:
+                with default_storage.open(thumbnail_name(candidate.photo_hash, size, ext)) as f:
+                    self.assertEqual(Image.open(f).size, (pixels, pixels))
+
+    def test_pages_serve_thumbnails(self):
+        candidate = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload())
+
+        response = self.client.get(reverse('vote', args=[self.election.id]))
+
+        self.assertContains(response, thumbnail_name(candidate.photo_hash, 'card', 'webp'))
+        self.assertNotContains(response, candidate.photo.url)
+
+    def test_build_thumbnails_refreshes_cached_ballots(self):
+        candidate = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload())
+        content_hash = candidate.photo_hash
+        # As uploaded before thumbnails existed
+        Candidate.objects.filter(id=candidate.id).update(photo_hash='')
+        bump_cache_version(self.election.id)
+        url = reverse('vote', args=[self.election.id])
+        self.assertContains(self.client.get(url), candidate.photo.url)
+
+        call_command('build_thumbnails', stdout=StringIO())
+
+        self.assertContains(self.client.get(url), thumbnail_name(content_hash, 'card', 'webp'))
+
+    def test_build_thumbnails_all_replaces_existing_files(self):
+        candidate = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload())
+        name = thumbnail_name(candidate.photo_hash, 'card', 'webp')
+        default_storage.delete(name)
+        default_storage.save(name, StringIO('not an image'))
+
+        call_command('build_thumbnails', all=True, stdout=StringIO())
+
+        with default_storage.open(name) as f:
+            self.assertEqual(Image.open(f).size, (THUMBNAIL_SIZES['card'],) * 2)
+        _, files = default_storage.listdir(os.path.dirname(name))
+        self.assertEqual(len(files), len(THUMBNAIL_SIZES) * len(THUMBNAIL_FORMATS))
+
+
+class PhotoStorageTests(CandidatePhotoTestCase):
+    def test_identical_uploads_share_one_file(self):
+        first = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload('a.jpg'))
+        second = Candidate.objects.create(position=self.position, name='Bob', photo=self.upload('b.jpg'))
+
+        self.assertEqual(first.photo.name, second.photo.name)
+        self.assertEqual(first.photo.name, f'candidates/{first.photo_hash[:2]}/{first.photo_hash}.jpg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(second.photo.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(default_storage.exists(second.photo.name))
+        self.assertFalse(default_storage.exists(thumbnail_name(second.photo_hash, 'avatar', 'webp')))
+
+    def test_gc_media_rehashes_and_removes_orphans(self):
+        for name in ('candidates/copy.jpg', 'candidates/copy_x1.jpg', 'candidates/orphan.jpg'):
+            default_storage.save(name, self.upload())
+        for name in ('candidates/copy.jpg', 'candidates/copy_x1.jpg'):
+            Candidate.objects.create(position=self.position, name=name, photo=name)
+
+        call_command('gc_media', rehash=True, min_age=0, stdout=StringIO())
+
+        self.assertEqual(len(set(Candidate.objects.values_list('photo', flat=True))), 1)
+        _, files = default_storage.listdir('candidates')
+        self.assertEqual(files, [])
+
+
+class BallotImportTests(CandidatePhotoTestCase):
+    def archive(self, *names):
+        out = BytesIO()
+        with zipfile.ZipFile(out, 'w') as archive:
+            for name in names:
+                archive.writestr(name, self.upload().read())
+        return out.getvalue()
+
+    def test_command_imports_positions_candidates_and_photos(self):
+        manifest = (
+            'position,name,photo,manifesto\n'
+            'President,Alice,photos/alice.jpg,Free coffee\n'
+            'President,Bob,bob.jpg,\n'
+            'Treasurer,Carol,alice.jpg,Balanced books\n'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {'manifest': f'{directory}/ballot.csv', 'photos': f'{directory}/photos.zip'}
+            with open(paths['manifest'], 'w') as f:
+                f.write(manifest)
+            with open(paths['photos'], 'wb') as f:
+                f.write(self.archive('photos/alice.jpg', 'bob.jpg'))
+            call_command('import_ballot', self.election.id, paths['manifest'], paths['photos'],
+                         workers=2, stdout=StringIO())
+
+        self.assertEqual(
+            list(Position.objects.filter(election=self.election).order_by('id').values_list('title', flat=True)),
+            ['President', 'Treasurer'],
+        )
+        alice, bob, carol = Candidate.objects.order_by('id')
+        self.assertEqual((alice.position, alice.manifesto), (self.position, 'Free coffee'))
+        # Same image bytes: one stored file and one set of thumbnails
+        self.assertEqual({alice.photo.name, bob.photo.name, carol.photo.name}, {alice.photo.name})
+        self.assertEqual(alice.photo.name, f'candidates/{alice.photo_hash[:2]}/{alice.photo_hash}.jpg')
+        with alice.photo.open('rb') as photo:
+            self.assertFalse(Image.open(photo).getexif())
+        self.assertTrue(default_storage.exists(thumbnail_name(alice.photo_hash, 'card', 'webp')))
+
+    def test_invalid_manifest_imports_nothing(self):
+        admin = get_user_model().objects.create_user('admin', password='secret-pass-123', role='admin')
+        self.client.force_login(admin)
+        manifest = (
+            'position,name,photo\n'
+            'President,Alice,alice.jpg\n'
+            'President,Alice,alice.jpg\n'
+            'Treasurer,Bob,missing.jpg\n'
+        )
+
+        response = self.client.post(reverse('ballot_import', args=[self.election.id]), {
+            'manifest': SimpleUploadedFile('ballot.csv', manifest.encode()),
+            'photos': SimpleUploadedFile('photos.zip', self.archive('alice.jpg')),
+        }, follow=True)
+
+        errors = [str(message) for message in response.context['messages']]
+        self.assertEqual(errors, [
+            'Line 3: Alice is already standing for President.',
+            'Line 4: missing.jpg is not in the photo archive.',
+        ])
+        self.assertFalse(Candidate.objects.exists())
+        self.assertEqual(Position.objects.count(), 1)
+
+    @override_settings(IMPORT_WORKERS=2)
+    def test_web_import_uses_threads(self):
+        admin = get_user_model().objects.create_user('admin', password='secret-pass-123', role='admin')
+        self.client.force_login(admin)
+        manifest = 'position,name,photo\nPresident,Alice,alice.jpg\nPresident,Bob,bob.jpg\n'
+
+        with mock.patch('elections.views.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+            self.client.post(reverse('ballot_import', args=[self.election.id]), {
+                'manifest': SimpleUploadedFile('ballot.csv', manifest.encode()),
+                'photos': SimpleUploadedFile('photos.zip', self.archive('alice.jpg', 'bob.jpg')),
+            })
+        executor.assert_called_once_with(2)
+        self.assertEqual(Candidate.objects.count(), 2)
+
+
+class MediaServingTests(CandidatePhotoTestCase):
+    def test_content_addressed_photo_is_immutable_and_revalidates(self):
+        candidate = Candidate.objects.create(position=self.position, name='Alice', photo=self.upload())
+
+        response = self.client.get(candidate.photo.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{candidate.photo_hash}"')
+
+        response = self.client.get(candidate.photo.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_and_sendfile(self):
+        default_storage.save('notes.txt', StringIO('0123456789'))
+
+        response = self.client.get('/media/notes.txt', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get('/media/notes.txt', HTTP_RANGE='bytes=20-').status_code, 416)
+
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get('/media/notes.txt')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/notes.txt')
+        self.assertEqual(response.content, b'')
+
+
+class ConcurrentVotingTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.election = Election.objects.create(
+            title='Student Council',
+            description='Annual election',
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+        )
+        self.candidates = []
+        for title in ('President', 'Secretary'):
+            position = Position.objects.create(title=title, election=self.election)
+            self.candidates.append(
+                Candidate.objects.create(position=position, name=f'{title} candidate', photo='candidates/test.png')
+            )
+
+    def submit(self, voter_hash, barrier):
+        try:
+            barrier.wait()
+            return cast_ballot(self.election, voter_hash, self.candidates)
+        finally:
+            connections.close_all()
+
+    def test_concurrent_ballots_store_one_row_per_voter(self):
+        voters = [f'voter-{i}' for i in range(4)]
+        submissions = voters * 4
+        barrier = threading.Barrier(len(submissions))
+
+        with ThreadPoolExecutor(max_workers=len(submissions)) as pool:
+            results = list(pool.map(lambda voter: self.submit(voter, barrier), submissions))
+
+        self.assertEqual(sum(ballot is not None for ballot in results), len(voters))
+        self.assertEqual(
+            sorted(Ballot.objects.values_list('voter_hash', flat=True)), sorted(voters)
+        )
+        self.assertEqual(Vote.objects.count(), len(voters) * len(self.candidates))
+        self.assertEqual(
+            sorted(CandidateTally.objects.values_list('count', flat=True)), [len(voters)] * len(self.candidates)
+        )
+
+    def test_bad_ballot_does_not_sink_its_batch(self):
+        removed = Candidate(id=self.candidates[-1].id + 100, position=self.candidates[0].position)
+        ballot_queue = BallotQueue(batch_size=3, flush_interval=5)
+        submissions = [('voter-1', self.candidates), ('voter-2', [removed]), ('voter-3', self.candidates)]
+
+        with ThreadPoolExecutor(len(submissions)) as pool:
+            futures = [
+                pool.submit(ballot_queue.submit, self.election, voter, candidates)
+                for voter, candidates in submissions
+            ]
+            wait(futures)
+
+        self.assertIsInstance(futures[1].exception(), IntegrityError)
+        self.assertEqual(sorted(Ballot.objects.values_list('voter_hash', flat=True)), ['voter-1', 'voter-3'])
+        self.assertEqual(Vote.objects.count(), 2 * len(self.candidates))
+
+    def test_duplicate_submission_is_not_an_error(self):
+        voter = get_user_model().objects.create_user('voter', password='secret-pass-123')
+        cast_ballot(self.election, get_voter_hash(voter), self.candidates)
+
+        # A second device whose session does not know about the first ballot
+        self.client.force_login(voter)
+        response = self.client.post(reverse('vote', args=[self.election.id]), {
+            f'position_{candidate.position_id}': candidate.id for candidate in self.candidates
+        })
+
+        self.assertRedirects(response, reverse('election_list'))
+        self.assertEqual(Ballot.objects.count(), 1)
+        self.assertEqual(Vote.objects.count(), len(self.candidates))
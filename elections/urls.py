@@ -8,11 +8,15 @@ urlpatterns = [
     path('', views.election_list, name='election_list'),
     path('vote/<int:election_id>/', views.vote_view, name='vote'),
     path('results/<int:election_id>/', views.results_view, name='results'),
+    path('results/<int:election_id>/json/', views.results_json, name='results_json'),
+    path('results/<int:election_id>/export/', views.results_export, name='results_export'),
+    path('results/<int:election_id>/stream/', views.results_stream, name='results_stream'),
 
     # ==========================================
     # ADMIN DASHBOARD & CORE MANAGEMENT
     # ==========================================
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin/election/<int:election_id>/ledger/', views.ledger_export, name='ledger_export'),
     
     # Election Actions
     path('admin/election/create/', views.election_create, name='election_create'),
@@ -36,6 +40,7 @@ urlpatterns = [
     # Step 2: Fill in candidate details (Name, Bio, Profile Pic)
     path('admin/candidate/create/<int:position_id>/', views.candidate_create, name='candidate_create'),
     path('admin/election/<int:election_id>/candidates/', views.candidate_manage, name='candidate_manage'),
+    path('admin/election/<int:election_id>/import/', views.ballot_import, name='ballot_import'),
     
     # Candidate Actions
     path('admin/candidate/edit/<int:pk>/', views.candidate_edit, name='candidate_edit'),
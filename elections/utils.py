@@ -1,12 +1,85 @@
-from cryptography.fernet import Fernet
-import os
+from cryptography.fernet import Fernet, MultiFernet
+from functools import lru_cache
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def vote_encryption_keys():
+    """
+    The Fernet keyring from settings.VOTE_ENCRYPTION_KEYS, newest first.
+    """
+    if not settings.VOTE_ENCRYPTION_KEYS:
+        raise ImproperlyConfigured("VOTE_ENCRYPTION_KEYS must be set to use vote audit payloads.")
+    return tuple(settings.VOTE_ENCRYPTION_KEYS)
+
+
+@lru_cache(maxsize=None)
+def _multi_fernet(keys):
+    try:
+        return MultiFernet([Fernet(key) for key in keys])
+    except ValueError as exc:
+        raise ImproperlyConfigured(f"Invalid key in VOTE_ENCRYPTION_KEYS: {exc}")
+
+
+def get_fernet():
+    """
+    Cached MultiFernet for the keyring: encrypts with the newest key and
+    decrypts with any of them.
+    """
+    return _multi_fernet(vote_encryption_keys())
+
+
+def vote_token_key():
+    if not settings.VOTE_TOKEN_KEY:
+        raise ImproperlyConfigured("VOTE_TOKEN_KEY must be set in production.")
+    return settings.VOTE_TOKEN_KEY
+
+
+def load_keys():
+    """
+    Build (and cache) every cipher once at startup, so a missing or
+    malformed key stops the app before it serves a request. The keyring is
+    only required when audit encryption is on.
+    """
+    if settings.VOTE_AUDIT_ENCRYPTION or settings.VOTE_ENCRYPTION_KEYS:
+        get_fernet()
+    _token_hmac(vote_token_key())
 
-# Store encryption key in environment variable
-KEY = os.environ.get('VOTE_ENCRYPTION_KEY', Fernet.generate_key())
-fernet = Fernet(KEY)
 
 def encrypt_vote(vote_text):
-    return fernet.encrypt(vote_text.encode()).decode()
+    return get_fernet().encrypt(vote_text.encode()).decode()
 
 def decrypt_vote(encrypted_text):
-    return fernet.decrypt(encrypted_text.encode()).decode()
+    return get_fernet().decrypt(encrypted_text.encode()).decode()
+
+
+@lru_cache(maxsize=None)
+def _token_hmac(key):
+    # Keyed once; every token is a copy() of this
+    return hmac.new(key.encode(), digestmod=hashlib.sha256)
+
+
+def candidate_token(candidate_id, key=None):
+    """
+    Deterministic HMAC-SHA256 of a candidate id, stored in
+    Vote.candidate_encrypted. The same candidate always gets the same token
+    so votes can be counted with an indexed equality match, but without
+    VOTE_TOKEN_KEY nobody can tell which candidate a token stands for.
+    key overrides VOTE_TOKEN_KEY (for re-tokening under a new key).
+    """
+    mac = _token_hmac(key or vote_token_key()).copy()
+    mac.update(f'candidate:{candidate_id}'.encode())
+    return mac.hexdigest()
+
+
+def protect_vote(candidate_id):
+    """
+    (token, audit_payload) to store for a vote. The payload is the
+    candidate id encrypted with Fernet when VOTE_AUDIT_ENCRYPTION is on,
+    otherwise empty.
+    """
+    audit_payload = encrypt_vote(str(candidate_id)) if settings.VOTE_AUDIT_ENCRYPTION else ''
+    return candidate_token(candidate_id), audit_payload
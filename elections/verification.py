@@ -0,0 +1,45 @@
+from collections import Counter
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+# Worker side of manage.py verify_tally. Kept free of Django imports so
+# process-pool workers start cheaply whichever start method is in use.
+
+_tokens = {}
+_fernet = None
+
+
+def init_worker(tokens, keys):
+    """
+    Runs once per worker: tokens maps candidate token -> candidate id,
+    keys is the Fernet keyring of the audit payloads (empty when none is
+    configured, in which case any audit payload fails the check).
+    """
+    global _tokens, _fernet
+    _tokens = tokens
+    _fernet = MultiFernet([Fernet(key) for key in keys]) if keys else None
+
+
+def resolve(token, audit_payload):
+    """
+    Candidate id for a stored vote, or None if its token matches no
+    candidate of the election or its audit payload names someone else.
+    """
+    candidate_id = _tokens.get(token)
+    if candidate_id is None or not audit_payload:
+        return candidate_id
+    if _fernet is None:
+        return None
+    try:
+        audited = int(_fernet.decrypt(audit_payload.encode()))
+    except (InvalidToken, ValueError):
+        return None
+    return candidate_id if audited == candidate_id else None
+
+
+def count_chunk(rows):
+    """
+    Counter of (position_id, candidate_id) for a chunk of
+    (position_id, candidate_encrypted, audit_payload) rows.
+    """
+    return Counter((position_id, resolve(token, audit_payload)) for position_id, token, audit_payload in rows)
@@ -1,20 +1,77 @@
+import hashlib
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone # Crucial for timezone-aware comparisons
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Election, Candidate, Vote, Position
-from .forms import ElectionForm, PositionForm, CandidateForm, VoteForm
-from .utils import encrypt_vote
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import IntegrityError
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from .models import Election, Candidate, Position
+from .forms import BallotImportForm, ElectionForm, PositionForm, CandidateForm, VoteForm
+from .caching import get_results, get_ballot
+from .exports import (
+    EXPORT_FORMATS, LEDGER_HEADER, RESULTS_HEADER, aiter_lines, export_lines, ledger_rows, result_rows
+)
+from .imports import BALLOT_HEADER, import_ballot, open_archive
+from .ingest import submit_ballot
+from .live import stream_results
+from .tally import results_payload
+from .voting import forget_voted, get_voter_hash, voted_elections, mark_voted
 # elections/templatetags/math_filters.py
 from django import template
-import hashlib
+
+
+ELECTIONS_PER_PAGE = 9
+ELECTION_STATUSES = ('all', 'active', 'upcoming', 'closed')
 
 
 @login_required
 def election_list(request):
-    elections = Election.objects.all()
+    now = timezone.now()
+    status = request.GET.get('status')
+    if status not in ELECTION_STATUSES:
+        status = 'all'
+
+    elections = Election.objects.annotate(
+        total_candidates=Coalesce(Subquery(
+            Candidate.objects.filter(position__election=OuterRef('pk')).order_by()
+            .values('position__election').annotate(total=Count('pk')).values('total')
+        ), 0),
+    ).prefetch_related(
+        # Avatars for the card: the first five candidates of the first position
+        Prefetch('positions', queryset=Position.objects.only('id', 'title', 'election_id').order_by('id')[:1],
+                 to_attr='featured_positions'),
+        Prefetch('featured_positions__candidates',
+                 queryset=Candidate.objects.only('id', 'name', 'photo', 'photo_hash', 'position_id').order_by('id')[:5],
+                 to_attr='featured_candidates'),
+    ).order_by('-start_time')
+
+    if status == 'active':
+        elections = elections.filter(start_time__lte=now, end_time__gte=now)
+    elif status == 'upcoming':
+        elections = elections.filter(start_time__gt=now)
+    elif status == 'closed':
+        elections = elections.filter(end_time__lt=now)
+
+    page_obj = Paginator(elections, ELECTIONS_PER_PAGE).get_page(request.GET.get('page'))
     return render(request, 'elections/election_list.html', {
-        'elections': elections
+        'elections': page_obj,
+        'page_obj': page_obj,
+        'status': status,
+        'statuses': ELECTION_STATUSES,
+        'now': now,
+        'voted_elections': voted_elections(request),
     })
 
 
@@ -29,85 +86,133 @@ def vote_view(request, election_id):
         messages.error(request, "This election has ended. You can no longer cast a vote.")
         return redirect('election_list')
 
-    voter_hash = hashlib.sha256(str(request.user.id).encode()).hexdigest()
-
     # Check if the user already voted
-    if Vote.objects.filter(election=election, voter_hash=voter_hash).exists():
+    if election.id in voted_elections(request):
         messages.warning(request, "You have already voted in this election.")
         return redirect('election_list')
 
+    # Positions and candidates are loaded once (and cached per election) and
+    # shared by the form and template
+    positions = get_ballot(election)
+
     if request.method == 'POST':
-        form = VoteForm(election, request.POST)
+        form = VoteForm(election, request.POST, positions=positions)
         if form.is_valid():
             # 2. Final check: Ensure the time didn't run out while they were filling the form
             if timezone.now() > election.end_time:
                 messages.error(request, "Submission failed: The polls closed before you submitted your vote.")
                 return redirect('election_list')
 
-            candidate = form.cleaned_data['candidate']
-
-            vote = Vote()
-            vote.voter_hash = voter_hash
-            vote.election = election
-            vote.candidate_encrypted = encrypt_vote(str(candidate.id))
-            vote.save()
+            try:
+                ballot = submit_ballot(election, get_voter_hash(request.user), form.selected_candidates())
+            except IntegrityError:
+                # A candidate was removed between loading the ballot and
+                # storing the vote; nothing was saved
+                messages.error(request, "The ballot changed while you were voting. Please review it and vote again.")
+                return redirect('vote', election_id=election.id)
+            except TimeoutError:
+                # Queued ingestion: the batch holding the ballot has not
+                # committed yet, so it may still be stored. Let the next
+                # request ask the database rather than the session
+                forget_voted(request)
+                messages.warning(request, "Your vote is still being recorded. Check back in a moment before voting again.")
+                return redirect('election_list')
+            mark_voted(request, election.id)
 
-            messages.success(request, "Your vote has been recorded.")
+            if ballot is None:
+                messages.warning(request, "You have already voted in this election.")
+            else:
+                messages.success(request, "Your vote has been recorded.")
             return redirect('election_list')
     else:
-        form = VoteForm(election)
+        form = VoteForm(election, positions=positions)
 
     return render(request, 'elections/vote.html', {
         'form': form,
         'election': election,
+        'positions': positions,
         'now': timezone.now() # Useful for initial client-side sync
     })
-def encrypt_vote(candidate_id):
-    # candidate_id must be string
-    return hashlib.sha256(str(candidate_id).encode()).hexdigest()
 
 
 @login_required
 def results_view(request, election_id):
     election = get_object_or_404(Election, id=election_id)
-    positions = Position.objects.filter(election=election)
-
-    total_votes = 0
-    results_by_position = []
-
-    for position in positions:
-        candidates = Candidate.objects.filter(position=position)
-        position_results = []
-
-        for candidate in candidates:
-            encrypted_candidate = encrypt_vote(str(candidate.id))
-            count = Vote.objects.filter(
-                election=election,
-                candidate_encrypted=encrypted_candidate
-            ).count()
-            total_votes += count
-            position_results.append({
-                'candidate': candidate,
-                'count': count
-            })
-
-        # Calculate percentages for each candidate
-        for r in position_results:
-            if total_votes > 0:
-                r['percentage'] = (r['count'] / total_votes) * 100
-            else:
-                r['percentage'] = 0
+    results = get_results(election)
+    return render(request, 'elections/results.html', results)
 
-        results_by_position.append({
-            'position': position,
-            'candidates': position_results
-        })
 
-    return render(request, 'elections/results.html', {
-        'election': election,
-        'results_by_position': results_by_position,
-        'total_votes': total_votes
-    })
+@login_required
+@require_safe
+def results_json(request, election_id):
+    """
+    Machine-readable results from the same cached snapshot as results_view.
+    The ETag is a hash of the body without its as_of timestamp, so it only
+    moves when the figures do, not every time the snapshot is recomputed;
+    pollers sending it back in If-None-Match get an empty 304.
+    """
+    election = get_object_or_404(Election, id=election_id)
+    payload = results_payload(get_results(election))
+    figures = json.dumps(dict(payload, as_of=None), separators=(',', ':')).encode()
+    etag = '"%s"' % hashlib.sha256(figures).hexdigest()[:32]
+    body = json.dumps(payload, separators=(',', ':')).encode()
+
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Make pollers revalidate every time instead of trusting a stale copy
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def _export_response(request, lines, export_format, filename):
+    if isinstance(request, ASGIRequest):
+        lines = aiter_lines(lines)
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(lines, content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+def _export_format(request):
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    return export_format
+
+
+@login_required
+@require_safe
+def results_export(request, election_id):
+    """
+    Per-candidate results as CSV or JSON Lines (?format=jsonl).
+    """
+    election = get_object_or_404(Election, id=election_id)
+    export_format = _export_format(request)
+    rows = result_rows(election, get_results(election))
+    return _export_response(
+        request, export_lines(RESULTS_HEADER, rows, export_format), export_format, f'election-{election.id}-results'
+    )
+
+
+async def results_stream(request, election_id):
+    """
+    Server-Sent Events feed of tally changes for the Tally Room. Needs an
+    ASGI server; every client of an election shares one producer.
+    """
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the endless stream would hold a worker thread forever.
+        # 204 tells EventSource to stop reconnecting; the page stays static
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if not await Election.objects.filter(id=election_id).aexists():
+        raise Http404("No Election matches the given query.")
+
+    response = StreamingHttpResponse(stream_results(election_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 
@@ -127,6 +232,22 @@ def admin_dashboard(request):
     elections = Election.objects.all()
     return render(request, 'adminpanel/dashboard.html', {'elections': elections})
 
+@login_required
+@admin_required
+@require_safe
+def ledger_export(request, election_id):
+    """
+    The anonymised vote ledger, streamed in chunks so memory stays flat
+    however many votes the election holds. Admins only: voter and
+    candidate hashes can be matched back to ids by anyone who can list them.
+    """
+    election = get_object_or_404(Election, id=election_id)
+    export_format = _export_format(request)
+    return _export_response(
+        request, export_lines(LEDGER_HEADER, ledger_rows(election), export_format), export_format,
+        f'election-{election.id}-ledger'
+    )
+
 @login_required
 @admin_required
 def election_create(request):
@@ -209,6 +330,36 @@ def candidate_create(request, position_id):
     })
 
 
+@login_required
+@admin_required
+def ballot_import(request, election_id):
+    """
+    Set up a whole ballot at once from a CSV manifest and a ZIP of photos
+    (see elections.imports) instead of one form per position and candidate.
+    """
+    election = get_object_or_404(Election, id=election_id)
+    form = BallotImportForm(request.POST or None, request.FILES or None)
+    if form.is_valid():
+        lines = io.TextIOWrapper(form.cleaned_data['manifest'], encoding='utf-8-sig', newline='')
+        try:
+            # Threads, not processes: forking from a server worker is unsafe
+            positions, candidates = import_ballot(
+                election, lines, open_archive(form.cleaned_data['photos']), executor=ThreadPoolExecutor
+            )
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+        except UnicodeDecodeError:
+            messages.error(request, "The manifest is not UTF-8 text.")
+        else:
+            messages.success(request, f"Imported {candidates} candidate(s) and {positions} new position(s).")
+            return redirect('candidate_manage', election_id=election.id)
+    return render(request, 'adminpanel/ballot_import.html', {
+        'form': form,
+        'election': election,
+        'columns': BALLOT_HEADER,
+    })
+
 register = template.Library()
 
 @register.filter
@@ -0,0 +1,142 @@
+import hashlib
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Ballot, Vote
+from .tally import record_votes
+
+VOTED_SESSION_KEY = 'voted_elections'
+
+
+def get_voter_hash(user):
+    return hashlib.sha256(str(user.id).encode()).hexdigest()
+
+
+def voted_elections(request):
+    """
+    Ids of the elections the logged-in user has cast a ballot in. Loaded
+    with one query on first use and then kept in the session.
+    """
+    voted = request.session.get(VOTED_SESSION_KEY)
+    if voted is None:
+        voted = list(
+            Ballot.objects.filter(voter_hash=get_voter_hash(request.user))
+            .values_list('election_id', flat=True)
+        )
+        request.session[VOTED_SESSION_KEY] = voted
+    return set(voted)
+
+
+def mark_voted(request, election_id):
+    voted = voted_elections(request)
+    voted.add(election_id)
+    request.session[VOTED_SESSION_KEY] = sorted(voted)
+
+
+def forget_voted(request):
+    """
+    Drop the ids kept in the session so the next voted_elections() call
+    reads them from the database again.
+    """
+    request.session.pop(VOTED_SESSION_KEY, None)
+
+
+def _insert_ballot(election, voter_hash):
+    """
+    Insert the voter's Ballot row, or return None if they already have one.
+    The unique (election, voter_hash) constraint is the only check.
+    """
+    if connection.vendor == 'postgresql':
+        # ON CONFLICT DO NOTHING keeps the transaction usable and avoids
+        # raising for the expected duplicate case
+        timestamp = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(Ballot._meta.db_table)} (election_id, voter_hash, timestamp) '
+                'VALUES (%s, %s, %s) ON CONFLICT (election_id, voter_hash) DO NOTHING RETURNING id',
+                [election.id, voter_hash, timestamp],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return Ballot(id=row[0], election=election, voter_hash=voter_hash, timestamp=timestamp)
+
+    try:
+        with transaction.atomic():
+            return Ballot.objects.create(election=election, voter_hash=voter_hash)
+    except IntegrityError:
+        return None
+
+
+def _build_votes(ballot, candidates):
+    votes = []
+    for candidate in candidates:
+        vote = Vote(election=ballot.election, ballot=ballot, position_id=candidate.position_id)
+        vote.set_candidate(candidate.id)
+        votes.append(vote)
+    return votes
+
+
+def cast_ballot(election, voter_hash, candidates):
+    """
+    Store a voter's ballot: the Ballot row, one Vote per selected candidate
+    in a single bulk insert, and the matching tally increments, all in one
+    transaction.
+
+    Returns the Ballot, or None if the voter had already voted. There is no
+    separate "has voted" query, so concurrent submissions from the same
+    voter cannot both succeed.
+    """
+    with transaction.atomic():
+        ballot = _insert_ballot(election, voter_hash)
+        if ballot is None:
+            return None
+        Vote.objects.bulk_create(_build_votes(ballot, candidates))
+        record_votes(election, candidates)
+    return ballot
+
+
+def cast_ballots(submissions):
+    """
+    Store many ballots in one transaction. submissions is a list of
+    (election, voter_hash, candidates) tuples; the result lists the Ballot
+    stored for each, or None for voters who had already voted (including
+    an earlier submission in the same batch).
+    """
+    results = [None] * len(submissions)
+    accepted = {}
+    for index, (election, voter_hash, candidates) in enumerate(submissions):
+        accepted.setdefault((election.id, voter_hash), index)
+
+    with transaction.atomic():
+        pending = [
+            Ballot(election=submissions[index][0], voter_hash=voter_hash)
+            for (election_id, voter_hash), index in accepted.items()
+        ]
+        ballots = None
+        if connection.features.can_return_rows_from_bulk_insert:
+            try:
+                with transaction.atomic():
+                    ballots = Ballot.objects.bulk_create(pending)
+            except IntegrityError:
+                pass
+        if ballots is None:
+            # Somebody in the batch has already voted (or the backend cannot
+            # return ids from a bulk insert): insert the ballots one by one
+            ballots = [_insert_ballot(ballot.election, ballot.voter_hash) for ballot in pending]
+
+        votes = []
+        candidates_by_election = {}
+        for index, ballot in zip(accepted.values(), ballots):
+            if ballot is None:
+                continue
+            election, voter_hash, candidates = submissions[index]
+            results[index] = ballot
+            votes.extend(_build_votes(ballot, candidates))
+            candidates_by_election.setdefault(election.id, (election, []))[1].extend(candidates)
+
+        Vote.objects.bulk_create(votes)
+        for election, candidates in candidates_by_election.values():
+            record_votes(election, candidates)
+    return results
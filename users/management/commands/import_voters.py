@@ -0,0 +1,40 @@
+import csv
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from users.roll import LINKS_HEADER, ROLL_HEADER, import_roll, set_password_links
+
+
+class Command(BaseCommand):
+    help = (
+        "Create voter accounts from a CSV voter roll (columns: "
+        f"{', '.join(ROLL_HEADER)}; only username is required). The roll is "
+        "checked in full first and the accounts are inserted in batches in "
+        "one transaction, with unusable passwords. --links writes each "
+        "voter's one-time set-password URL to a CSV file for distribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('roll', help="CSV file, one voter per row")
+        parser.add_argument('--links', help="Write username, email and set-password URL of each voter to this CSV file")
+        parser.add_argument('--base-url', default='', help="Site address to prefix the links with, e.g. https://vote.example.edu")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['roll'], encoding='utf-8-sig', newline='') as lines:
+                voters = import_roll(lines)
+        except ValidationError as e:
+            raise CommandError("Nobody was imported:\n  " + "\n  ".join(e.messages))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(voters):,} voter(s) in {time.perf_counter() - started:.1f}s."
+        ))
+
+        if options['links']:
+            with open(options['links'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(LINKS_HEADER)
+                writer.writerows(set_password_links(voters, options['base_url']))
+            self.stdout.write(f"Set-password links written to {options['links']}.")
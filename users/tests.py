@@ -1,3 +1,56 @@
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 
-# Create your tests here.
+from .models import CustomUser
+
+
+class VoterRollTests(TestCase):
+    def import_roll(self, roll, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(roll)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_voters', f.name, stdout=StringIO(), **options)
+
+    def test_import_creates_voters_with_one_time_links(self):
+        with tempfile.TemporaryDirectory() as directory:
+            links = f'{directory}/links.csv'
+            self.import_roll(
+                'username,email,first_name,last_name\n'
+                'alice,alice@example.edu,Alice,Uwase\n'
+                'bob,,,\n',
+                links=links, base_url='https://vote.example.edu/',
+            )
+            with open(links, newline='') as f:
+                rows = list(csv.DictReader(f))
+
+        alice = CustomUser.objects.get(username='alice')
+        self.assertEqual((alice.role, alice.is_approved, alice.first_name), ('voter', True, 'Alice'))
+        self.assertFalse(alice.has_usable_password())
+        self.assertEqual([row['username'] for row in rows], ['alice', 'bob'])
+        self.assertTrue(rows[0]['set_password_url'].startswith('https://vote.example.edu/users/set-password/'))
+
+        url = rows[0]['set_password_url'].removeprefix('https://vote.example.edu')
+        form_url = self.client.get(url)['Location']
+        response = self.client.post(form_url, {'new_password1': 'a-long-ballot-2026', 'new_password2': 'a-long-ballot-2026'})
+        self.assertRedirects(response, '/users/login/', fetch_redirect_response=False)
+        alice.refresh_from_db()
+        self.assertTrue(alice.check_password('a-long-ballot-2026'))
+        # The link only works once
+        self.assertFalse(self.client.get(url, follow=True).context['validlink'])
+
+    def test_invalid_roll_imports_nobody(self):
+        CustomUser.objects.create_user('carol')
+
+        with self.assertRaises(CommandError) as error:
+            self.import_roll('username,email\nalice,not-an-email\nbob,\nbob,\ncarol,\n')
+
+        message = str(error.exception)
+        self.assertIn('Line 2: Enter a valid email address.', message)
+        self.assertIn('Line 4: bob is listed twice.', message)
+        self.assertEqual(CustomUser.objects.count(), 1)
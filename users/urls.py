@@ -1,4 +1,5 @@
-from django.urls import path
+from django.contrib.auth import views as auth_views
+from django.urls import path, reverse_lazy
 from .import views 
 
 urlpatterns = [
@@ -7,4 +8,8 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('login-redirect/', views.login_redirect, name='login_redirect'),
     path('logout/', views.logout_view, name='logout'),
+    # One-time links handed out to voters imported from a roll (users.roll)
+    path('set-password/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(
+        template_name='users/set_password.html', success_url=reverse_lazy('login'),
+    ), name='set_password'),
 ]